@@ -0,0 +1,38 @@
+"""add: content_hash column to knowledge_chunk
+
+Revision ID: 2d6c8e0f4a93
+Revises: 9e3a5c7b1f42
+Create Date: 2026-10-18 12:31:50.672180
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2d6c8e0f4a93'
+down_revision: Union[str, Sequence[str], None] = '9e3a5c7b1f42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('knowledge_chunk', sa.Column('content_hash', sqlmodel.sql.sqltypes.AutoString(), nullable=True))
+    # Same digest as src.chatbot.utils.content_hash: sha256 hex of the UTF-8 text
+    op.execute(
+        """
+        UPDATE knowledge_chunk
+        SET content_hash = encode(sha256(convert_to(chunk_text, 'UTF8')), 'hex')
+        """
+    )
+    op.create_index('ix_knowledge_chunk_kb_id_content_hash', 'knowledge_chunk', ['kb_id', 'content_hash'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_knowledge_chunk_kb_id_content_hash', table_name='knowledge_chunk')
+    op.drop_column('knowledge_chunk', 'content_hash')
@@ -0,0 +1,54 @@
+"""add: matryoshka embedding_coarse column to knowledge_chunk
+
+Revision ID: 4b8f0d2e6a17
+Revises: 7c2e9a41d5b3
+Create Date: 2026-10-18 11:02:17.554903
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+from pgvector.sqlalchemy import Vector
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b8f0d2e6a17'
+down_revision: Union[str, Sequence[str], None] = '7c2e9a41d5b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('knowledge_chunk', sa.Column('embedding_coarse', Vector(256), nullable=True))
+
+    # Backfill: first 256 Matryoshka dims of the stored embedding, re-normalised
+    # (subvector / l2_normalize need pgvector >= 0.7)
+    op.execute(
+        """
+        UPDATE knowledge_chunk
+        SET embedding_coarse = l2_normalize(subvector(embedding, 1, 256))
+        WHERE embedding IS NOT NULL
+        """
+    )
+
+    with op.get_context().autocommit_block():
+        op.execute(
+            """
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_knowledge_chunk_embedding_coarse_hnsw
+            ON knowledge_chunk
+            USING hnsw (embedding_coarse vector_ip_ops)
+            WITH (m = 16, ef_construction = 64)
+            """
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute(
+            "DROP INDEX CONCURRENTLY IF EXISTS ix_knowledge_chunk_embedding_coarse_hnsw"
+        )
+    op.drop_column('knowledge_chunk', 'embedding_coarse')
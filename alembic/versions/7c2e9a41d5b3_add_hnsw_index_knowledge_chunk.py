@@ -0,0 +1,42 @@
+"""add: hnsw index on knowledge_chunk embedding
+
+Revision ID: 7c2e9a41d5b3
+Revises: 142c69b4cf87
+Create Date: 2026-10-18 10:12:41.308215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c2e9a41d5b3'
+down_revision: Union[str, Sequence[str], None] = '142c69b4cf87'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS vector")
+    # vector_ip_ops matches the `<#>` (negative inner product) operator used by search
+    with op.get_context().autocommit_block():
+        op.execute(
+            """
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_knowledge_chunk_embedding_hnsw
+            ON knowledge_chunk
+            USING hnsw (embedding vector_ip_ops)
+            WITH (m = 16, ef_construction = 64)
+            """
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute(
+            "DROP INDEX CONCURRENTLY IF EXISTS ix_knowledge_chunk_embedding_hnsw"
+        )
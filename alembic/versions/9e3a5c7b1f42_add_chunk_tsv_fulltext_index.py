@@ -0,0 +1,49 @@
+"""add: generated chunk_tsv column with gin index to knowledge_chunk
+
+Revision ID: 9e3a5c7b1f42
+Revises: 4b8f0d2e6a17
+Create Date: 2026-10-18 11:48:05.193627
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e3a5c7b1f42'
+down_revision: Union[str, Sequence[str], None] = '4b8f0d2e6a17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'knowledge_chunk',
+        sa.Column(
+            'chunk_tsv',
+            postgresql.TSVECTOR(),
+            sa.Computed("to_tsvector('english', chunk_text)", persisted=True),
+            nullable=True,
+        ),
+    )
+
+    with op.get_context().autocommit_block():
+        op.execute(
+            """
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_knowledge_chunk_chunk_tsv
+            ON knowledge_chunk
+            USING gin (chunk_tsv)
+            """
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_knowledge_chunk_chunk_tsv")
+    op.drop_column('knowledge_chunk', 'chunk_tsv')
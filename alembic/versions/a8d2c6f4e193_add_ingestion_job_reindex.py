@@ -0,0 +1,31 @@
+"""add: reindex flag on ingestion_jobs
+
+Revision ID: a8d2c6f4e193
+Revises: f1b7d3a95c20
+Create Date: 2026-10-18 21:04:52.617390
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a8d2c6f4e193'
+down_revision: Union[str, Sequence[str], None] = 'f1b7d3a95c20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'ingestion_jobs',
+        sa.Column('reindex', sa.Boolean(), server_default=sa.false(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('ingestion_jobs', 'reindex')
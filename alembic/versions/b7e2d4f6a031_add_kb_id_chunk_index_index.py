@@ -0,0 +1,40 @@
+"""add: (kb_id, chunk_index) index on knowledge_chunk
+
+Revision ID: b7e2d4f6a031
+Revises: 6a1f3b9d2c58
+Create Date: 2026-10-18 15:22:47.093115
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e2d4f6a031'
+down_revision: Union[str, Sequence[str], None] = '6a1f3b9d2c58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_knowledge_chunk_kb_id_chunk_index',
+            'knowledge_chunk',
+            ['kb_id', 'chunk_index'],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_knowledge_chunk_kb_id_chunk_index',
+            table_name='knowledge_chunk',
+            postgresql_concurrently=True,
+        )
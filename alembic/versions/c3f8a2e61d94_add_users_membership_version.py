@@ -0,0 +1,74 @@
+"""add: membership_version on users, bumped by user_teams_role / roles triggers
+
+Revision ID: c3f8a2e61d94
+Revises: e4a9c1d7b265
+Create Date: 2026-10-18 17:41:12.530614
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3f8a2e61d94'
+down_revision: Union[str, Sequence[str], None] = 'e4a9c1d7b265'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'users',
+        sa.Column('membership_version', sa.Integer(), server_default='0', nullable=False),
+    )
+
+    # Memberships are also edited by seed scripts and by hand, so the bump
+    # lives in the database rather than in the app
+    op.execute(
+        """
+        CREATE FUNCTION bump_membership_version() RETURNS trigger AS $$
+        BEGIN
+            IF TG_TABLE_NAME = 'roles' THEN
+                UPDATE users SET membership_version = membership_version + 1
+                WHERE id IN (SELECT user_id FROM user_teams_role WHERE role_id = NEW.id);
+            ELSE
+                IF TG_OP <> 'INSERT' THEN
+                    UPDATE users SET membership_version = membership_version + 1
+                    WHERE id = OLD.user_id;
+                END IF;
+                IF TG_OP <> 'DELETE' THEN
+                    UPDATE users SET membership_version = membership_version + 1
+                    WHERE id = NEW.user_id;
+                END IF;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER user_teams_role_membership_version
+        AFTER INSERT OR UPDATE OR DELETE ON user_teams_role
+        FOR EACH ROW EXECUTE FUNCTION bump_membership_version()
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER roles_membership_version
+        AFTER UPDATE OF name ON roles
+        FOR EACH ROW EXECUTE FUNCTION bump_membership_version()
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS roles_membership_version ON roles")
+    op.execute("DROP TRIGGER IF EXISTS user_teams_role_membership_version ON user_teams_role")
+    op.execute("DROP FUNCTION IF EXISTS bump_membership_version()")
+    op.drop_column('users', 'membership_version')
@@ -0,0 +1,43 @@
+"""drop: full-width hnsw index on knowledge_chunk embedding
+
+Revision ID: d6e1f9a3b725
+Revises: a8d2c6f4e193
+Create Date: 2026-10-18 22:31:07.904618
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd6e1f9a3b725'
+down_revision: Union[str, Sequence[str], None] = 'a8d2c6f4e193'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Two-stage search reads candidates from the coarse index and re-scores
+    # them on full vectors without an index, so the 768-dim graph is unused
+    with op.get_context().autocommit_block():
+        op.execute(
+            "DROP INDEX CONCURRENTLY IF EXISTS ix_knowledge_chunk_embedding_hnsw"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Columns are halfvec from e4a9c1d7b265 onwards
+    with op.get_context().autocommit_block():
+        op.execute(
+            """
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_knowledge_chunk_embedding_hnsw
+            ON knowledge_chunk
+            USING hnsw (embedding halfvec_ip_ops)
+            WITH (m = 16, ef_construction = 64)
+            """
+        )
@@ -0,0 +1,88 @@
+"""update: store knowledge_chunk embeddings as halfvec
+
+Revision ID: e4a9c1d7b265
+Revises: b7e2d4f6a031
+Create Date: 2026-10-18 16:48:03.571284
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4a9c1d7b265'
+down_revision: Union[str, Sequence[str], None] = 'b7e2d4f6a031'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (column, dimensions, HNSW index)
+EMBEDDING_COLUMNS = [
+    ('embedding', 768, 'ix_knowledge_chunk_embedding_hnsw'),
+    ('embedding_coarse', 256, 'ix_knowledge_chunk_embedding_coarse_hnsw'),
+]
+
+
+def _columns_not_of_type(vector_type: str):
+    """Embedding columns whose current type is not `vector_type`."""
+    current = dict(
+        op.get_bind().execute(
+            sa.text(
+                "SELECT attname, format_type(atttypid, atttypmod) FROM pg_attribute "
+                "WHERE attrelid = 'knowledge_chunk'::regclass AND NOT attisdropped"
+            )
+        ).all()
+    )
+    return [
+        (column, dim, index)
+        for column, dim, index in EMBEDDING_COLUMNS
+        if current.get(column) != f"{vector_type}({dim})"
+    ]
+
+
+def _convert(vector_type: str) -> None:
+    # Driven by the columns' actual types, not by app settings, so the result
+    # is the same wherever it runs and a rerun after a partial failure only
+    # finishes the columns that are left.
+    columns = _columns_not_of_type(vector_type)
+    if not columns:
+        return
+
+    # The HNSW indexes are tied to the column type's operator class, so they
+    # are dropped before the rewrite and rebuilt on the converted columns.
+    with op.get_context().autocommit_block():
+        for _, _, index in columns:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {index}")
+
+    op.execute(
+        "ALTER TABLE knowledge_chunk "
+        + ", ".join(
+            f"ALTER COLUMN {column} TYPE {vector_type}({dim}) "
+            f"USING {column}::{vector_type}({dim})"
+            for column, dim, _ in columns
+        )
+    )
+
+    with op.get_context().autocommit_block():
+        for column, _, index in columns:
+            op.execute(
+                f"""
+                CREATE INDEX CONCURRENTLY IF NOT EXISTS {index}
+                ON knowledge_chunk
+                USING hnsw ({column} {vector_type}_ip_ops)
+                WITH (m = 16, ef_construction = 64)
+                """
+            )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # halfvec needs pgvector >= 0.7
+    _convert('halfvec')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _convert('vector')
@@ -0,0 +1,234 @@
+import uuid
+from dataclasses import dataclass, field
+from typing import List
+
+from cachetools import TTLCache
+from fastapi import Depends, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials
+from jose import JWTError
+from sqlalchemy.orm import aliased
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.auth.utils import bearer_scheme, decode_token, get_current_user
+from src.core.config import settings
+from src.core.database import get_async_session
+from src.core.models import Roles, Teams, Users, UserTeamsRole
+
+MENTOR_ROLE = "Mentor"
+SUB_MENTOR_ROLE = "Sub Mentor"
+LEAD_ROLE = "Team Lead"
+DEFAULT_ROLE = "Member"
+# Roles of teammates the app shows as contacts / notifies about leaves
+TEAM_CONTACT_ROLES = (MENTOR_ROLE, SUB_MENTOR_ROLE, LEAD_ROLE)
+
+
+@dataclass
+class IdentityContext:
+    """A user with their team membership, role and the team's mentors and leads."""
+
+    user: Users
+    team: Teams | None = None
+    role: Roles | None = None
+    mentors: List[Users] = field(default_factory=list)
+    sub_mentors: List[Users] = field(default_factory=list)
+    leads: List[Users] = field(default_factory=list)
+
+    @property
+    def role_name(self) -> str:
+        return self.role.name if self.role else DEFAULT_ROLE
+
+    def token_claims(self) -> dict:
+        """JWT claims for this identity, shared by access and refresh tokens."""
+        return {
+            "sub": str(self.user.id),
+            "name": self.user.user_name,
+            "email": self.user.email_id,
+            "role_id": str(self.role.id) if self.role else None,
+            "role": self.role_name,
+            "team_id": str(self.team.id) if self.team else None,
+            "mv": self.user.membership_version,
+        }
+
+
+@dataclass(frozen=True)
+class TokenIdentity:
+    """Identity read from a verified access token, without touching the database."""
+
+    user_id: uuid.UUID
+    name: str | None
+    email: str | None
+    role_id: uuid.UUID | None
+    role: str
+    team_id: uuid.UUID | None
+    membership_version: int
+
+    @classmethod
+    def from_claims(cls, claims: dict) -> "TokenIdentity":
+        role_id = claims.get("role_id")
+        team_id = claims.get("team_id")
+        return cls(
+            user_id=uuid.UUID(claims["sub"]),
+            name=claims.get("name"),
+            email=claims.get("email"),
+            role_id=uuid.UUID(role_id) if role_id else None,
+            role=claims.get("role") or DEFAULT_ROLE,
+            team_id=uuid.UUID(team_id) if team_id else None,
+            membership_version=claims["mv"],
+        )
+
+
+class MembershipVersions:
+    """
+    Short-lived cache of users.membership_version.
+
+    A trigger bumps the column whenever a user's team or role mapping
+    changes; tokens carrying an older version are rejected so the client
+    refreshes and picks up the new claims. Within the TTL a check costs no
+    query, so an org change takes effect after at most `ttl` seconds.
+    """
+
+    def __init__(self, maxsize: int, ttl: int):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    async def get(self, session: AsyncSession, user_id: uuid.UUID) -> int | None:
+        version = self._cache.get(user_id)
+        if version is None:
+            version = (
+                await session.exec(
+                    select(Users.membership_version).where(Users.id == user_id)
+                )
+            ).first()
+            if version is not None:
+                self._cache[user_id] = version
+        return version
+
+    def set(self, user_id: uuid.UUID, version: int):
+        self._cache[user_id] = version
+
+
+membership_versions = MembershipVersions(
+    maxsize=settings.MEMBERSHIP_VERSION_CACHE_SIZE,
+    ttl=settings.MEMBERSHIP_VERSION_CACHE_TTL,
+)
+
+
+async def load_identity(session: AsyncSession, *where) -> IdentityContext | None:
+    """
+    Load the user matching `where` plus their team, role, mentors and leads
+    in one query.
+
+    The user's membership is left-joined to their team and role, and to
+    every teammate holding a contact role, so the result has one row per
+    mentor/lead (or a single row for users without a team). Users with
+    several memberships get the first one, as the per-table lookups did.
+    """
+    contacts = (
+        select(
+            UserTeamsRole.team_id,
+            UserTeamsRole.user_id,
+            Roles.name.label("role_name"),
+        )
+        .join(Roles, Roles.id == UserTeamsRole.role_id)
+        .where(Roles.name.in_(TEAM_CONTACT_ROLES))
+        .subquery()
+    )
+    contact = aliased(Users)
+
+    rows = (
+        await session.exec(
+            select(Users, UserTeamsRole, Teams, Roles, contacts.c.role_name, contact)
+            .outerjoin(UserTeamsRole, UserTeamsRole.user_id == Users.id)
+            .outerjoin(Teams, Teams.id == UserTeamsRole.team_id)
+            .outerjoin(Roles, Roles.id == UserTeamsRole.role_id)
+            .outerjoin(contacts, contacts.c.team_id == UserTeamsRole.team_id)
+            .outerjoin(contact, contact.id == contacts.c.user_id)
+            .where(*where)
+        )
+    ).all()
+
+    if not rows:
+        return None
+
+    user, membership, team, role, _, _ = rows[0]
+    membership_versions.set(user.id, user.membership_version)
+    identity = IdentityContext(user=user, team=team, role=role)
+    by_role = {
+        MENTOR_ROLE: identity.mentors,
+        SUB_MENTOR_ROLE: identity.sub_mentors,
+        LEAD_ROLE: identity.leads,
+    }
+
+    for _, row_membership, _, _, contact_role, contact_user in rows:
+        if contact_user is None or row_membership.id != membership.id:
+            continue
+        by_role[contact_role].append(contact_user)
+
+    return identity
+
+
+async def get_identity(
+    user_id: str = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+) -> IdentityContext:
+    """
+    Identity of the authenticated user.
+
+    FastAPI resolves a dependency once per request, so every handler and
+    sub-dependency that asks for it shares the same single query.
+    """
+    identity = await load_identity(session, Users.id == uuid.UUID(user_id))
+    if identity is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
+        )
+    return identity
+
+
+async def get_current_active_user(
+    identity: IdentityContext = Depends(get_identity),
+) -> Users:
+    """Return the full user model for the currently authenticated user."""
+    if not identity.user.is_verified:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="User not verified"
+        )
+    return identity.user
+
+
+async def get_token_identity(
+    credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
+    session: AsyncSession = Depends(get_async_session),
+) -> TokenIdentity:
+    """
+    Role and team of the authenticated user, taken from the access token.
+
+    Tokens issued before the user's last membership change are rejected
+    with 401 so the client calls /auth/refresh for up-to-date claims.
+    """
+    try:
+        claims = decode_token(credentials.credentials)
+    except JWTError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired token",
+        )
+
+    if "sub" not in claims or "mv" not in claims:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has no membership claims, refresh it",
+        )
+
+    identity = TokenIdentity.from_claims(claims)
+    version = await membership_versions.get(session, identity.user_id)
+    if version is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
+        )
+    if version != identity.membership_version:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Team or role changed, refresh token",
+        )
+    return identity
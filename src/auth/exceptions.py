@@ -0,0 +1,10 @@
+class PasswordHashQueueFull(Exception):
+    """Raised when the password hashing executor already has its maximum number of jobs waiting."""
+
+
+class LoginThrottled(Exception):
+    """Raised when a login attempt exceeds the per-email or per-IP rate limit."""
+
+    def __init__(self, retry_after: float):
+        super().__init__("Too many login attempts, try again later")
+        self.retry_after = retry_after
@@ -0,0 +1,161 @@
+"""
+Password hashing off the event loop.
+
+    python -m src.auth.hashing --concurrency 1 4 16 64 --logins 64
+
+runs a login (bcrypt verify) benchmark through the executor and reports
+logins/sec, p95 latency, shed requests and the worst event-loop stall at
+each concurrency level.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Tuple, TypeVar
+
+from passlib.context import CryptContext
+
+from src.core.config import settings
+from .exceptions import PasswordHashQueueFull
+
+T = TypeVar("T")
+
+# min == max == default: a hash with any other cost is reported as needing an update
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+)
+
+
+class PasswordHasher:
+    """
+    Bounded thread pool for bcrypt.
+
+    bcrypt releases the GIL, so `workers` hashes run in parallel while the
+    event loop keeps serving other routes. Once `max_pending` calls are
+    queued or running, new ones raise PasswordHashQueueFull so the route can
+    answer 429 instead of letting a login burst queue up indefinitely.
+    """
+
+    def __init__(self, context: CryptContext, workers: int, max_pending: int):
+        self.context = context
+        self.workers = max(workers, 1)
+        self.max_pending = max(max_pending, 1)
+        self._pool: ThreadPoolExecutor | None = None
+        self._pending = 0
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="bcrypt"
+            )
+        return self._pool
+
+    async def _run(self, fn: Callable[..., T], *args) -> T:
+        if self._pending >= self.max_pending:
+            raise PasswordHashQueueFull(
+                f"Password hashing queue is full ({self.max_pending} pending jobs)"
+            )
+
+        self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_pool(), partial(fn, *args))
+        finally:
+            self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(self.context.verify, plain_password, hashed_password)
+
+    async def verify_and_update(
+        self, plain_password: str, hashed_password: str
+    ) -> Tuple[bool, str | None]:
+        """Verify, and return a new hash as well when the stored one uses another cost."""
+        return await self._run(
+            self.context.verify_and_update, plain_password, hashed_password
+        )
+
+    def shutdown(self, wait: bool = True):
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait, cancel_futures=True)
+            self._pool = None
+
+
+password_hasher = PasswordHasher(
+    pwd_context,
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+)
+
+
+async def _max_loop_stall_ms(stop: asyncio.Event, interval: float = 0.005) -> float:
+    worst = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, (time.perf_counter() - start - interval) * 1000)
+    return worst
+
+
+async def benchmark(concurrency_levels, logins: int):
+    stored = pwd_context.hash("benchmark-password")
+    print(
+        f"bcrypt rounds={settings.BCRYPT_ROUNDS}, workers={password_hasher.workers}, "
+        f"max_pending={password_hasher.max_pending}"
+    )
+    print(f"{'concurrency':>12}{'logins/s':>10}{'p95 ms':>10}{'shed':>8}{'loop stall ms':>15}")
+
+    for concurrency in concurrency_levels:
+        latencies = []
+        shed = 0
+        queue = asyncio.Queue()
+        for _ in range(logins):
+            queue.put_nowait(None)
+
+        async def client():
+            nonlocal shed
+            while not queue.empty():
+                queue.get_nowait()
+                start = time.perf_counter()
+                try:
+                    await password_hasher.verify("benchmark-password", stored)
+                    latencies.append((time.perf_counter() - start) * 1000)
+                except PasswordHashQueueFull:
+                    shed += 1
+
+        stop = asyncio.Event()
+        monitor = asyncio.create_task(_max_loop_stall_ms(stop))
+        start = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        stall = await monitor
+
+        p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else 0.0
+        print(
+            f"{concurrency:>12}{len(latencies) / elapsed:>10.1f}{p95:>10.1f}"
+            f"{shed:>8}{stall:>15.1f}"
+        )
+
+    password_hasher.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="bcrypt login throughput benchmark")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--logins", type=int, default=64)
+    args = parser.parse_args()
+
+    asyncio.run(benchmark(args.concurrency, args.logins))
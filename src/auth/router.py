@@ -1,6 +1,7 @@
+import math
 import uuid
 from src.core.database import get_async_session
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from jose import jwt, JWTError
 from fastapi import APIRouter, Depends, HTTPException
 from sqlmodel import Session
@@ -10,7 +11,11 @@ from src.auth.service import (
     verify_email,
     login_user,
 )
-from src.auth.utils import get_current_user
+from src.auth.dependencies import TokenIdentity, get_token_identity, load_identity
+from src.auth.exceptions import LoginThrottled, PasswordHashQueueFull
+from src.auth.hashing import password_hasher
+from src.auth.throttle import login_throttle
+from src.auth.utils import get_current_user, token_cache
 from src.core.models import Users, Roles, UserTeamsRole
 from sqlmodel import select
 from src.core.config import settings
@@ -35,6 +40,8 @@ async def signup(
         return {"code": 200, "data": response}
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except PasswordHashQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
 
 
 # @router.post("/send-verification", response_model=BaseResponse)
@@ -61,29 +68,34 @@ async def signup(
 
 @router.post("/login", response_model=BaseResponse)
 async def login(
-    payload: LoginRequest, session: AsyncSession = Depends(get_async_session)
+    payload: LoginRequest,
+    request: Request,
+    session: AsyncSession = Depends(get_async_session),
 ):
-    response = await login_user(session, payload.email, payload.password)
-
-    user_id = response["user"]["id"]
-
-    # 🔥 Fetch User Role
-    result = await session.exec(
-        select(Roles)
-        .join(UserTeamsRole, UserTeamsRole.role_id == Roles.id)
-        .where(UserTeamsRole.user_id == uuid.UUID(user_id))
-    )
-
-    role_obj = result.first()
-    role_name = role_obj.name if role_obj else "Member"
+    # Before login_user: a throttled attempt costs no query and no bcrypt
+    try:
+        await login_throttle.check(
+            payload.email, request.client.host if request.client else None
+        )
+    except LoginThrottled as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(math.ceil(e.retry_after))},
+        )
 
-    response["user"]["role"] = (role_name or "member").lower()
+    try:
+        response = await login_user(session, payload.email, payload.password)
+    except PasswordHashQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
 
     return {"code": 200, "data": response}
 
 
 @router.post("/refresh", response_model=BaseResponse)
-async def refresh_token(request: dict):
+async def refresh_token(
+    request: dict, session: AsyncSession = Depends(get_async_session)
+):
     """Generate new access token using refresh token"""
     refresh_token = request.get("refresh_token")
     if not refresh_token:
@@ -96,37 +108,30 @@ async def refresh_token(request: dict):
         if payload.get("type") != "refresh":
             raise HTTPException(status_code=400, detail="Invalid refresh token")
 
-        user_data = {
-            "sub": payload["sub"],
-            "name": payload.get("name"),
-            "email": payload.get("email"),
-        }
-        new_access_token = create_access_token(data=user_data)
-        return {"code": 200, "data": {"access_token": new_access_token}}
-
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid or expired refresh token")
 
+    # Role and team are re-read so the new token reflects org changes
+    identity = await load_identity(session, Users.id == uuid.UUID(payload["sub"]))
+    if not identity:
+        raise HTTPException(status_code=401, detail="Invalid or expired refresh token")
+
+    new_access_token = create_access_token(data=identity.token_claims())
+    return {"code": 200, "data": {"access_token": new_access_token}}
+
 
 @router.get("/home", response_model=BaseResponse)
 async def get_home(
-    user_id: str = Depends(get_current_user),
+    identity: TokenIdentity = Depends(get_token_identity),
     session: AsyncSession = Depends(get_async_session),
 ):
     """
     Protected home endpoint. Requires a valid access token (Bearer).
     """
-    user = await session.get(Users, uuid.UUID(user_id))
+    user = await session.get(Users, identity.user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    role_join = await session.exec(
-        select(Roles.name)
-        .join(UserTeamsRole, UserTeamsRole.role_id == Roles.id)
-        .where(UserTeamsRole.user_id == uuid.UUID(user_id))
-    )
-    user_role = role_join.first() or "Member"
-
     # Example payload — replace with your real app data
     return {
         "code": 200,
@@ -139,7 +144,7 @@ async def get_home(
                 "is_verified": user.is_verified,
                 "dob": user.dob.isoformat() if user.dob else None,
                 "profile_picture": user.profile_picture,
-                "role": user_role.lower(),
+                "role": identity.role.lower(),
             },
             "home_data": {
                 "announcements": ["Welcome!", "New protocol released"],
@@ -147,3 +152,12 @@ async def get_home(
             },
         },
     }
+
+
+@router.get("/metrics")
+async def auth_metrics(user_id: str = Depends(get_current_user)):
+    return {
+        "token_cache": token_cache.stats(),
+        "password_hash_pending": password_hasher.pending,
+        "login_throttle": login_throttle.stats(),
+    }
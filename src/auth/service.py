@@ -1,11 +1,11 @@
 import uuid
+from src.auth.dependencies import IdentityContext, load_identity
+from src.auth.hashing import password_hasher
 from src.auth.utils import (
     # send_otp_email,
-    verify_password,
     create_refresh_token,
     verify_verification_token,
     create_access_token,
-    hash_password,
     create_verification_token,
 )
 from src.core.models import Users
@@ -28,7 +28,7 @@ async def create_user(session: AsyncSession, name: str, email: str, password: st
     new_user = Users(
         user_name=name,
         email_id=email,
-        password=hash_password(password),
+        password=await password_hasher.hash(password),
         is_verified=True,
     )
 
@@ -36,21 +36,10 @@ async def create_user(session: AsyncSession, name: str, email: str, password: st
     await session.commit()
     await session.refresh(new_user)
 
-    access_token = create_access_token(
-        data={
-            "sub": str(new_user.id),
-            "name": new_user.user_name,
-            "email": new_user.email_id,
-        }
-    )
-
-    refresh_token = create_refresh_token(
-        data={
-            "sub": str(new_user.id),
-            "name": new_user.user_name,
-            "email": new_user.email_id,
-        }
-    )
+    # A new user has no team yet; claims are refreshed once they are mapped
+    claims = IdentityContext(user=new_user).token_claims()
+    access_token = create_access_token(data=claims)
+    refresh_token = create_refresh_token(data=claims)
 
     return {
         "message": "User created successfully",
@@ -94,21 +83,17 @@ async def verify_email(session: Session, token: str):
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-    user = await session.get(Users, uuid.UUID(user_id))
-    if not user:
+    identity = await load_identity(session, Users.id == uuid.UUID(user_id))
+    if not identity:
         raise HTTPException(status_code=404, detail="User not found")
+    user = identity.user
 
     if not user.is_verified:
         user.is_verified = True
         await session.commit()
 
-    access_token = create_access_token(
-        data={"sub": str(user.id), "name": user.user_name, "email": user.email_id}
-    )
-
-    refresh_token = create_refresh_token(
-        data={"sub": str(user.id), "name": user.user_name, "email": user.email_id}
-    )
+    access_token = create_access_token(data=identity.token_claims())
+    refresh_token = create_refresh_token(data=identity.token_claims())
 
     return {
         "message": "Email verified successfully!",
@@ -123,25 +108,27 @@ async def login_user(session: Session, email: str, password: str):
     if not email.lower():
         raise HTTPException(status_code=400, detail="Enter you're valid email ID")
 
-    users = await session.exec(select(Users).where(Users.email_id == email))
-    user = users.first()
+    # Role is loaded with the user so the login response needs no second query
+    identity = await load_identity(session, Users.email_id == email)
 
-    if not user:
+    if not identity:
         raise HTTPException(status_code=400, detail="Invalid email or password")
+    user = identity.user
 
-    if not verify_password(password, user.password):
+    verified, new_hash = await password_hasher.verify_and_update(password, user.password)
+    if not verified:
         raise HTTPException(status_code=400, detail="Invalid email or password")
 
+    # Stored hash predates the current BCRYPT_ROUNDS; upgrade it transparently
+    if new_hash:
+        user.password = new_hash
+        await session.commit()
+
     if not user.is_verified:
         raise HTTPException(status_code=400, detail="Verify email to login")
 
-    access_token = create_access_token(
-        data={"sub": str(user.id), "name": user.user_name, "email": user.email_id}
-    )
-
-    refresh_token = create_refresh_token(
-        data={"sub": str(user.id), "name": user.user_name, "email": user.email_id}
-    )
+    access_token = create_access_token(data=identity.token_claims())
+    refresh_token = create_refresh_token(data=identity.token_claims())
 
     return {
         "access_token": access_token,
@@ -152,5 +139,6 @@ async def login_user(session: Session, email: str, password: str):
             "name": user.user_name,
             "email": user.email_id,
             "is_verified": user.is_verified,
+            "role": identity.role_name.lower(),
         },
     }
@@ -0,0 +1,153 @@
+"""
+Login throttling with token buckets per email and per client IP.
+
+Each key holds a (tokens, updated_at) pair that refills continuously, which
+behaves like a sliding window without storing individual attempts. IP and
+email buckets live in separate bounded LRUs, so memory stays constant however
+many emails or IPs an attacker cycles through, and cycling through one
+keyspace cannot evict (and so reset) buckets in the other.
+
+The client IP is only as good as what uvicorn reports: behind the Spaces
+proxy it must run with --proxy-headers so request.client is the forwarded
+address. A peer that is not a public address (the proxy itself, or a local
+client) is shared by many users, so it gets no IP bucket.
+"""
+import ipaddress
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, NamedTuple, Tuple
+
+from cachetools import LRUCache
+
+from src.core.config import settings
+from .exceptions import LoginThrottled
+
+
+def normalize_email(email: str) -> str:
+    return email.strip().lower()
+
+
+def is_client_address(host: str | None) -> bool:
+    """True if `host` is a public IP that can be attributed to one client."""
+    if not host:
+        return False
+    try:
+        return ipaddress.ip_address(host).is_global
+    except ValueError:
+        return False
+
+
+class Bucket(NamedTuple):
+    scope: str
+    key: str
+    capacity: float
+    refill_per_sec: float
+
+
+class ThrottleBackend(ABC):
+    """
+    Storage for token buckets, grouped by scope ("ip" or "email").
+
+    The in-memory backend is per process; with several workers or hosts,
+    implement `take` on a shared store (e.g. a Redis script doing the same
+    refill-and-take atomically) and pass it to LoginThrottle.
+    """
+
+    @abstractmethod
+    async def take(self, *buckets: Bucket) -> float:
+        """
+        Take one token from every bucket if all of them have one, else none.
+
+        Returns 0 if allowed, else seconds until every bucket has a token.
+        """
+
+
+class MemoryThrottleBackend(ThrottleBackend):
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        # One LRU per scope, created on first use
+        self._buckets: Dict[str, LRUCache] = {}
+
+    def _lru(self, scope: str) -> LRUCache:
+        buckets = self._buckets.get(scope)
+        if buckets is None:
+            buckets = self._buckets[scope] = LRUCache(maxsize=self.maxsize)
+        return buckets
+
+    async def take(self, *buckets: Bucket) -> float:
+        # No await between reads and writes, so this is atomic on the event loop
+        now = time.monotonic()
+        levels = []
+        for bucket in buckets:
+            tokens, updated_at = self._lru(bucket.scope).get(
+                bucket.key, (bucket.capacity, now)
+            )
+            levels.append(
+                min(bucket.capacity, tokens + (now - updated_at) * bucket.refill_per_sec)
+            )
+
+        allowed = all(tokens >= 1 for tokens in levels)
+        for bucket, tokens in zip(buckets, levels):
+            self._lru(bucket.scope)[bucket.key] = (tokens - 1 if allowed else tokens, now)
+        if allowed:
+            return 0.0
+
+        return max(
+            (1 - tokens) / bucket.refill_per_sec
+            for bucket, tokens in zip(buckets, levels)
+            if tokens < 1
+        )
+
+    def sizes(self) -> Dict[str, int]:
+        return {scope: len(buckets) for scope, buckets in self._buckets.items()}
+
+
+class LoginThrottle:
+    """
+    Two token buckets per login attempt: one for the client IP (credential
+    stuffing across many accounts) and one for the normalised email
+    (guessing one account from many IPs, or a client stuck in a retry loop).
+
+    `check` only touches the backend, so a throttled attempt is rejected
+    before any database query or bcrypt work. Both buckets are checked
+    before either is charged, so an attempt rejected for its email does not
+    use up the IP's tokens (and vice versa).
+    """
+
+    def __init__(
+        self,
+        backend: ThrottleBackend,
+        email_burst: int,
+        email_per_minute: float,
+        ip_burst: int,
+        ip_per_minute: float,
+    ):
+        self.backend = backend
+        self.email_limit: Tuple[float, float] = (email_burst, email_per_minute / 60)
+        self.ip_limit: Tuple[float, float] = (ip_burst, ip_per_minute / 60)
+        self.rejected = 0
+
+    async def check(self, email: str, client_ip: str | None):
+        buckets = [Bucket("email", normalize_email(email), *self.email_limit)]
+        if is_client_address(client_ip):
+            buckets.append(Bucket("ip", client_ip, *self.ip_limit))
+
+        retry_after = await self.backend.take(*buckets)
+        if retry_after:
+            self.rejected += 1
+            raise LoginThrottled(retry_after)
+
+    def stats(self) -> dict:
+        stats = {"rejected": self.rejected}
+        if isinstance(self.backend, MemoryThrottleBackend):
+            stats["keys"] = self.backend.sizes()
+        return stats
+
+
+login_throttle = LoginThrottle(
+    MemoryThrottleBackend(maxsize=settings.LOGIN_THROTTLE_MAX_KEYS),
+    email_burst=settings.LOGIN_RATE_EMAIL_BURST,
+    email_per_minute=settings.LOGIN_RATE_EMAIL_PER_MINUTE,
+    ip_burst=settings.LOGIN_RATE_IP_BURST,
+    ip_per_minute=settings.LOGIN_RATE_IP_PER_MINUTE,
+)
@@ -1,20 +1,20 @@
+import hashlib
 import json
 import smtplib
 import os
-import uuid
+import threading
+import time
 from email.mime.text import MIMEText
 import logging
 import traceback
-from passlib.context import CryptContext
-from src.core.database import get_async_session
-from sqlmodel.ext.asyncio.session import AsyncSession
 from jose import jwt, JWTError
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from datetime import datetime, timedelta
+from cachetools import LRUCache
 from cryptography.fernet import Fernet, InvalidToken
 from fastapi import Depends, HTTPException, status
-from src.core.models import Users
 from src.core.config import settings
+from src.auth.hashing import pwd_context
 
 
 SECRET_KEY = settings.SECRET_KEY
@@ -31,16 +31,13 @@ FERNET_KEY = settings.FERNET_KEY
 VERIFICATION_BASE_URL = settings.VERIFICATION_BASE_URL
 
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-
 def hash_password(password: str) -> str:
-    """Encrypt plain password into hashed password"""
+    """Encrypt plain password into hashed password (blocking; use password_hasher in routes)"""
     return pwd_context.hash(password)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Compare plain password with stored hash"""
+    """Compare plain password with stored hash (blocking; use password_hasher in routes)"""
     return pwd_context.verify(plain_password, hashed_password)
 
 
@@ -153,17 +150,80 @@ async def verify_verification_token(token: str) -> str:
         raise ValueError("Invalid verification link")
 
 
+class TokenCache:
+    """
+    Size-bounded LRU of verified JWT claims, keyed by a SHA-256 of the token.
+
+    An entry lives until the token's own `exp`: it is checked on every read,
+    so a cached token is never accepted after it expires. Tokens without an
+    `exp` claim are not cached.
+    """
+
+    def __init__(self, maxsize: int):
+        self._cache = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def get(self, token: str) -> dict | None:
+        key = self._key(token)
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and time.time() >= entry[1]:
+                del self._cache[key]
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return dict(entry[0])
+
+    def set(self, token: str, claims: dict):
+        exp = claims.get("exp")
+        if not isinstance(exp, (int, float)):
+            return
+        with self._lock:
+            self._cache[self._key(token)] = (dict(claims), exp)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._cache),
+            "maxsize": self._cache.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+token_cache = TokenCache(maxsize=settings.JWT_DECODE_CACHE_SIZE)
+
+
+def decode_token(token: str) -> dict:
+    """Verify a JWT and return its claims; raises JWTError. Repeat tokens are served from token_cache."""
+    claims = token_cache.get(token)
+    if claims is None:
+        claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        token_cache.set(token, claims)
+    return claims
+
+
 bearer_scheme = HTTPBearer()
 
 
-def  get_current_user(
+async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
 ):
     """Decode JWT token and extract current user ID"""
     token = credentials.credentials
 
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_token(token)
         user_id: str = payload.get("sub")
 
         if user_id is None:
@@ -180,23 +240,6 @@ def  get_current_user(
         )
 
 
-async def get_current_active_user(
-    session: AsyncSession = Depends(get_async_session),
-    user_id: str = Depends(get_current_user),
-) -> Users:
-    """Return the full user model for the currently authenticated user."""
-    user = await session.get(Users, uuid.UUID(user_id))
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
-        )
-    if not user.is_verified:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN, detail="User not verified"
-        )
-    return user
-
-
 def create_refresh_token(data: dict, expires_days: int = 7):
     """Create a long-lived JWT refresh token"""
     to_encode = data.copy()
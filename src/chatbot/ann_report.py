@@ -0,0 +1,157 @@
+"""
+Recall vs latency report for two-stage search over knowledge_chunk.
+
+Samples stored chunk embeddings as queries and computes the exact top-k on
+full vectors. It then runs the query that search_chunks serves: candidates
+from the coarse HNSW index, re-scored on full vectors. This repeats for each
+candidate count and prints recall@k with p50 / p95 latency. As in
+search_chunks, ef_search is raised to cover the candidate count.
+
+    python -m src.chatbot.ann_report --queries 200 --top-k 5 --candidates 25 50 100 200
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import numpy as np
+from pgvector import HalfVector
+from sqlalchemy import text
+
+from src.core.database import async_session
+from .embedding import truncate_embeddings
+from .models import COARSE_EMBEDDING_DIM, EMBEDDING_STORAGE
+from .service import DEFAULT_EF_SEARCH, SEARCH_COARSE_CANDIDATES
+
+EXACT_SQL = text(
+    f"""
+    SELECT id
+    FROM knowledge_chunk
+    ORDER BY embedding <#> CAST(:query_vec AS {EMBEDDING_STORAGE})
+    LIMIT :top_k
+    """
+)
+
+# Same shape as the two-stage query in service.search_chunks
+TWO_STAGE_SQL = text(
+    f"""
+    WITH coarse AS (
+        SELECT id, embedding
+        FROM knowledge_chunk
+        ORDER BY embedding_coarse <#> CAST(:coarse_vec AS {EMBEDDING_STORAGE})
+        LIMIT :candidates
+    )
+    SELECT id
+    FROM coarse
+    ORDER BY embedding <#> CAST(:query_vec AS {EMBEDDING_STORAGE})
+    LIMIT :top_k
+    """
+)
+
+
+async def _sample_queries(n: int):
+    async with async_session() as session:
+        result = await session.execute(
+            text(
+                "SELECT embedding FROM knowledge_chunk "
+                "ORDER BY random() LIMIT :n"
+            ),
+            {"n": n},
+        )
+        # The binary codec decodes vector to an ndarray and halfvec to a HalfVector
+        return [
+            np.asarray(
+                r.embedding.to_numpy() if isinstance(r.embedding, HalfVector) else r.embedding,
+                dtype=np.float32,
+            )
+            for r in result.fetchall()
+        ]
+
+
+async def _search(sql, params: dict, settings: dict):
+    async with async_session() as session:
+        for name, value in settings.items():
+            await session.execute(
+                text("SELECT set_config(:name, :value, true)"),
+                {"name": name, "value": value},
+            )
+        start = time.perf_counter()
+        result = await session.execute(sql, params)
+        ids = [r.id for r in result.fetchall()]
+        return ids, (time.perf_counter() - start) * 1000
+
+
+def _percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct * (len(ordered) - 1))))]
+
+
+async def run_report(n_queries: int, top_k: int, candidate_values, ef_search: int):
+    queries = await _sample_queries(n_queries)
+    if not queries:
+        print("knowledge_chunk is empty, nothing to measure.")
+        return
+
+    exact = []
+    exact_ms = []
+    for q in queries:
+        ids, ms = await _search(
+            EXACT_SQL,
+            {"query_vec": q, "top_k": top_k},
+            {"enable_indexscan": "off", "enable_bitmapscan": "off"},
+        )
+        exact.append(set(ids))
+        exact_ms.append(ms)
+
+    print(f"{len(queries)} queries, top_k={top_k}")
+    print(f"{'mode':<24}{'recall@k':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    print(
+        f"{'exact scan':<24}{1.0:>10.3f}"
+        f"{statistics.median(exact_ms):>10.2f}{_percentile(exact_ms, 0.95):>10.2f}"
+    )
+
+    for candidates in candidate_values:
+        candidates = max(candidates, top_k)
+        ef = max(ef_search, candidates)
+        hits = 0
+        latencies = []
+        for q, truth in zip(queries, exact):
+            ids, ms = await _search(
+                TWO_STAGE_SQL,
+                {
+                    "query_vec": q,
+                    "coarse_vec": truncate_embeddings(q, COARSE_EMBEDDING_DIM),
+                    "candidates": candidates,
+                    "top_k": top_k,
+                },
+                {"hnsw.ef_search": str(ef)},
+            )
+            hits += len(truth.intersection(ids))
+            latencies.append(ms)
+
+        recall = hits / sum(len(t) for t in exact)
+        label = f"candidates={candidates} ef={ef}"
+        print(
+            f"{label:<24}{recall:>10.3f}"
+            f"{statistics.median(latencies):>10.2f}{_percentile(latencies, 0.95):>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument(
+        "--candidates",
+        type=int,
+        nargs="+",
+        default=[
+            SEARCH_COARSE_CANDIDATES // 2,
+            SEARCH_COARSE_CANDIDATES,
+            SEARCH_COARSE_CANDIDATES * 2,
+        ],
+    )
+    parser.add_argument("--ef-search", type=int, default=DEFAULT_EF_SEARCH)
+    args = parser.parse_args()
+
+    asyncio.run(run_report(args.queries, args.top_k, args.candidates, args.ef_search))
@@ -0,0 +1,129 @@
+import asyncio
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List
+
+import numpy as np
+
+EMBED_BATCH_WINDOW_MS = float(os.getenv("EMBED_BATCH_WINDOW_MS", "5"))
+EMBED_BATCH_MAX_ITEMS = int(os.getenv("EMBED_BATCH_MAX_ITEMS", "32"))
+
+EmbedManyFn = Callable[..., Awaitable[np.ndarray]]
+
+
+@dataclass
+class _PendingEmbed:
+    text: str
+    max_length: int
+    future: asyncio.Future
+    enqueued_at: float
+
+
+@dataclass
+class BatchMetrics:
+    batches: int = 0
+    items: int = 0
+    max_batch_size: int = 0
+    total_wait_ms: float = 0.0
+    max_wait_ms: float = 0.0
+    failures: int = 0
+    batch_sizes: Dict[int, int] = field(default_factory=dict)
+
+    def record(self, size: int, waits_ms: List[float]):
+        self.batches += 1
+        self.items += size
+        self.max_batch_size = max(self.max_batch_size, size)
+        self.batch_sizes[size] = self.batch_sizes.get(size, 0) + 1
+        self.total_wait_ms += sum(waits_ms)
+        self.max_wait_ms = max(self.max_wait_ms, max(waits_ms))
+
+    def snapshot(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "failures": self.failures,
+            "avg_batch_size": self.items / self.batches if self.batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "avg_queue_wait_ms": self.total_wait_ms / self.items if self.items else 0.0,
+            "max_queue_wait_ms": self.max_wait_ms,
+            "batch_size_histogram": dict(sorted(self.batch_sizes.items())),
+        }
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-text embedding calls into one padded batch.
+
+    Requests are held for at most `window_ms` (or until `max_items` are
+    waiting), then handed to `embed_many` together. Each caller's future is
+    resolved with its own vector.
+    """
+
+    def __init__(self, embed_many: EmbedManyFn, window_ms: float, max_items: int):
+        self.embed_many = embed_many
+        self.window_s = max(window_ms, 0.0) / 1000
+        self.max_items = max(max_items, 1)
+        self.metrics = BatchMetrics()
+        self._pending: List[_PendingEmbed] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    async def submit(self, text: str, max_length: int = 512) -> np.ndarray:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append(
+            _PendingEmbed(text, max_length, future, time.perf_counter())
+        )
+
+        if len(self._pending) >= self.max_items:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window_s, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        task = asyncio.get_running_loop().create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[_PendingEmbed]):
+        dispatched_at = time.perf_counter()
+        self.metrics.record(
+            len(batch), [(dispatched_at - p.enqueued_at) * 1000 for p in batch]
+        )
+
+        by_length: Dict[int, List[_PendingEmbed]] = {}
+        for item in batch:
+            by_length.setdefault(item.max_length, []).append(item)
+
+        for max_length, items in by_length.items():
+            live = [p for p in items if not p.future.done()]
+            if not live:
+                continue
+
+            try:
+                vectors = await self.embed_many(
+                    [p.text for p in live],
+                    batch_size=self.max_items,
+                    max_length=max_length,
+                )
+            except Exception as e:
+                self.metrics.failures += 1
+                for p in live:
+                    if not p.future.done():
+                        p.future.set_exception(e)
+                continue
+
+            for p, vec in zip(live, vectors):
+                if not p.future.done():
+                    p.future.set_result(vec)
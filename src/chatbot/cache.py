@@ -0,0 +1,168 @@
+import hashlib
+import os
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+import numpy as np
+from cachetools import LRUCache, TTLCache
+
+EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "2048"))
+EMBED_CACHE_TTL_SECONDS = int(os.getenv("EMBED_CACHE_TTL_SECONDS", "86400"))
+EMBED_CACHE_WARM_FILE = os.getenv("EMBED_CACHE_WARM_FILE")
+EMBED_CACHE_WARM_TOP_N = int(os.getenv("EMBED_CACHE_WARM_TOP_N", "100"))
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "1024"))
+# Query vectors are rounded to this many decimals before hashing
+SEARCH_CACHE_DECIMALS = int(os.getenv("SEARCH_CACHE_DECIMALS", "4"))
+
+
+def normalize_query(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+class EmbeddingCache:
+    """
+    Size-bounded LRU cache with a TTL for query embeddings.
+
+    Keys are a SHA-256 of the normalised text plus model id and max_length,
+    so the same question asked with different casing or spacing hits.
+    """
+
+    def __init__(self, model_id: str, maxsize: int, ttl: int):
+        self.model_id = model_id
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, text: str, max_length: int) -> str:
+        raw = f"{self.model_id}\x00{max_length}\x00{normalize_query(text)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, text: str, max_length: int) -> Optional[np.ndarray]:
+        vec = self._cache.get(self.key(text, max_length))
+        if vec is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return vec
+
+    def set(self, text: str, max_length: int, vec: np.ndarray):
+        # Shared between callers, so cached vectors are made read-only
+        vec = np.array(vec, dtype=np.float32)
+        vec.setflags(write=False)
+        self._cache[self.key(text, max_length)] = vec
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._cache),
+            "maxsize": self._cache.maxsize,
+            "ttl_seconds": self._cache.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+class KBVersions:
+    """
+    Write counters for knowledge bases: one per KB plus a global one.
+
+    Every write to a KB bumps both, so a cached result scoped to some KBs
+    stays valid until one of those KBs changes, and an unscoped result until
+    any KB changes. Counters live in this process only.
+    """
+
+    def __init__(self):
+        self.global_version = 0
+        self._versions: Dict[UUID, int] = {}
+
+    def bump(self, kb_id: UUID):
+        self.global_version += 1
+        self._versions[kb_id] = self._versions.get(kb_id, 0) + 1
+
+    def snapshot(self, kb_ids: Sequence[UUID] | None) -> Tuple:
+        if not kb_ids:
+            return (self.global_version,)
+        return tuple(self._versions.get(kb_id, 0) for kb_id in sorted(set(kb_ids)))
+
+
+class SearchResultCache:
+    """
+    LRU cache of search results, invalidated by KB version instead of a TTL.
+
+    Callers take `version(kb_ids)` before running the query and store it
+    with the rows; an entry is only served while the versions of the KBs it
+    covers are unchanged, so a write racing the query never leaves stale rows.
+    """
+
+    def __init__(self, maxsize: int, decimals: int = SEARCH_CACHE_DECIMALS):
+        self.decimals = decimals
+        self.versions = KBVersions()
+        self._cache = LRUCache(maxsize=maxsize)
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, q_vector: np.ndarray, kb_ids: Sequence[UUID] | None, *options) -> str:
+        digest = hashlib.sha256(
+            np.round(np.asarray(q_vector, dtype=np.float32), self.decimals).tobytes()
+        )
+        scope = sorted(set(kb_ids)) if kb_ids else None
+        digest.update(repr((scope, options)).encode("utf-8"))
+        return digest.hexdigest()
+
+    def version(self, kb_ids: Sequence[UUID] | None) -> Tuple:
+        return self.versions.snapshot(kb_ids)
+
+    def get(self, key: str, kb_ids: Sequence[UUID] | None) -> Optional[list]:
+        entry = self._cache.get(key)
+        if entry is None or entry[0] != self.version(kb_ids):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: str, version: Tuple, rows: list):
+        self._cache[key] = (version, rows)
+
+    def invalidate(self, kb_id: UUID):
+        self.versions.bump(kb_id)
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._cache),
+            "maxsize": self._cache.maxsize,
+            "global_version": self.versions.global_version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+search_cache = SearchResultCache(maxsize=SEARCH_CACHE_SIZE)
+
+
+def load_warm_queries(path: str | None = EMBED_CACHE_WARM_FILE, top_n: int = EMBED_CACHE_WARM_TOP_N) -> List[str]:
+    """Read up to `top_n` queries (one per line, most frequent first) for warm-loading."""
+    if not path or not os.path.exists(path):
+        return []
+
+    queries = []
+    seen = set()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            query = line.strip()
+            if not query or normalize_query(query) in seen:
+                continue
+            seen.add(normalize_query(query))
+            queries.append(query)
+            if len(queries) >= top_n:
+                break
+    return queries
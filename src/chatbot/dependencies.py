@@ -0,0 +1,26 @@
+import os
+
+from fastapi import Depends, HTTPException, status
+
+from src.auth.dependencies import IdentityContext, get_identity
+
+# Members of these teams, or holders of these roles, may change knowledge bases
+KB_ADMIN_TEAMS = {
+    t.strip() for t in os.getenv("KB_ADMIN_TEAMS", "HR Team").split(",") if t.strip()
+}
+KB_ADMIN_ROLES = {
+    r.strip() for r in os.getenv("KB_ADMIN_ROLES", "HR,HR Manager").split(",") if r.strip()
+}
+
+
+async def require_kb_admin(
+    identity: IdentityContext = Depends(get_identity),
+) -> IdentityContext:
+    """Allow only KB admins to create or modify knowledge bases (ingestion is CPU heavy)."""
+    team_name = identity.team.name if identity.team else None
+    if team_name not in KB_ADMIN_TEAMS and identity.role_name not in KB_ADMIN_ROLES:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not allowed to manage knowledge bases",
+        )
+    return identity
@@ -1,17 +1,83 @@
+import asyncio
+import logging
 import os
 import numpy as np
 from typing import List
-import onnxruntime as ort
-from transformers import AutoTokenizer
-from huggingface_hub import hf_hub_download
+
+from .cache import (
+    EMBED_CACHE_SIZE,
+    EMBED_CACHE_TTL_SECONDS,
+    EmbeddingCache,
+    load_warm_queries,
+)
+from .batching import EMBED_BATCH_MAX_ITEMS, EMBED_BATCH_WINDOW_MS, MicroBatcher
+from .executor import ORT_INTRA_OP_THREADS, inference_executor
 
 MODEL_ID = "onnx-community/embeddinggemma-300m-ONNX"
+DEFAULT_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+logger = logging.getLogger(__name__)
+
+# Directory holding a pinned copy of MODEL_ID (tokenizer files + onnx/); no hub calls when set
+EMBEDDING_MODEL_DIR = os.getenv("EMBEDDING_MODEL_DIR")
+# Dynamically quantized INT8 graph produced by `python -m src.chatbot.quantize convert`
+EMBEDDING_QUANTIZED = os.getenv("EMBEDDING_QUANTIZED", "false").lower() == "true"
+EMBEDDING_INT8_PATH = os.getenv("EMBEDDING_INT8_PATH", "assets/onnx/model_int8.onnx")
+
+
+def truncate_embeddings(vectors: np.ndarray, dim: int) -> np.ndarray:
+    """Matryoshka truncation: keep the first `dim` components and re-normalise."""
+    truncated = np.asarray(vectors, dtype=np.float32)[..., :dim]
+    norms = np.linalg.norm(truncated, axis=-1, keepdims=True)
+    return truncated / np.where(norms > 0, norms, 1.0)
+
 
 class EmbeddingModel:
-    def __init__(self):
-        self.tokenizer = AutoTokenizer.from_pretrained(MODEL_ID)
+    """
+    ONNX embeddinggemma wrapper.
+
+    Construction is cheap: the tokenizer and ONNX session are only loaded on
+    first use (or by `warm_up()` from the app's startup task), so importing
+    src.main does not touch the Hugging Face hub.
+    """
+
+    def __init__(
+        self,
+        model_dir: str | None = EMBEDDING_MODEL_DIR,
+        quantized: bool = EMBEDDING_QUANTIZED,
+        int8_path: str = EMBEDDING_INT8_PATH,
+    ):
+        self.model_dir = model_dir
+        self.quantized = quantized
+        self.int8_path = int8_path
+        self.variant = "int8" if quantized else "fp32"
+        self.tokenizer = None
+        self.session = None
+        self.load_error: str | None = None
+        self._load_lock: asyncio.Lock | None = None
+
+        self.batcher = MicroBatcher(
+            self.embed_batch,
+            window_ms=EMBED_BATCH_WINDOW_MS,
+            max_items=EMBED_BATCH_MAX_ITEMS,
+        )
+        self.cache = EmbeddingCache(
+            f"{MODEL_ID}:{self.variant}",
+            maxsize=EMBED_CACHE_SIZE,
+            ttl=EMBED_CACHE_TTL_SECONDS,
+        )
+
+    @property
+    def is_ready(self) -> bool:
+        return self.session is not None
+
+    def resolve_fp32_path(self) -> str:
+        """Path of the original fp32 graph, downloading it if no local dir is pinned."""
+        if self.model_dir:
+            return os.path.join(self.model_dir, "onnx", "model.onnx")
 
-        self.model_path = hf_hub_download(
+        from huggingface_hub import hf_hub_download
+
+        model_path = hf_hub_download(
             repo_id=MODEL_ID,
             filename="onnx/model.onnx"
         )
@@ -19,29 +85,75 @@ class EmbeddingModel:
             repo_id=MODEL_ID,
             filename="onnx/model.onnx_data"
         )
+        return model_path
+
+    def _load(self):
+        # Heavy imports are deferred so the rest of the app boots without them
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        if self.model_dir:
+            tokenizer = AutoTokenizer.from_pretrained(
+                self.model_dir, local_files_only=True
+            )
+        else:
+            tokenizer = AutoTokenizer.from_pretrained(MODEL_ID)
 
-        model_dir = os.path.dirname(self.model_path)
+        if self.quantized:
+            if not os.path.exists(self.int8_path):
+                raise FileNotFoundError(
+                    f"INT8 model not found at {self.int8_path}; "
+                    "run `python -m src.chatbot.quantize convert` first"
+                )
+            self.model_path = self.int8_path
+        else:
+            self.model_path = self.resolve_fp32_path()
 
-        self.session = ort.InferenceSession(
+        sess_options = ort.SessionOptions()
+        sess_options.intra_op_num_threads = ORT_INTRA_OP_THREADS
+        sess_options.inter_op_num_threads = 1
+
+        session = ort.InferenceSession(
             self.model_path,
+            sess_options=sess_options,
             providers=["CPUExecutionProvider"],
         )
 
-        self.input_names = [i.name for i in self.session.get_inputs()]
-        self.output_names = [o.name for o in self.session.get_outputs()]
+        self.input_names = [i.name for i in session.get_inputs()]
+        self.output_names = [o.name for o in session.get_outputs()]
+        self.tokenizer = tokenizer
+        self.session = session
 
-    async def embed_text(self, text: str, max_length=512) -> List[float]:
+    async def ensure_loaded(self):
+        if self.is_ready:
+            return
 
-        encoded = self.tokenizer(
-            text,
-            truncation=True,
-            padding=True,
-            max_length=max_length,
-            return_tensors="np",
-        )
+        if self._load_lock is None:
+            self._load_lock = asyncio.Lock()
+
+        async with self._load_lock:
+            if self.is_ready:
+                return
+            try:
+                await inference_executor.run(self._load)
+                self.load_error = None
+            except Exception as e:
+                self.load_error = str(e)
+                raise
+
+    async def warm_up(self):
+        """Startup task: load the model, then pre-embed frequent queries."""
+        try:
+            await self.ensure_loaded()
+            await self.warm_cache()
+        except Exception:
+            # Runs detached from any request; first use will retry the load
+            logger.exception("Embedding model warm-up failed")
 
-        input_ids = encoded["input_ids"].astype(np.int64)
-        attention_mask = encoded["attention_mask"].astype(np.int64)
+    def _forward(self, input_ids: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        """Run one padded batch and return L2-normalised mean-pooled vectors."""
+        input_ids = input_ids.astype(np.int64)
+        attention_mask = attention_mask.astype(np.int64)
 
         outputs = self.session.run(
             self.output_names,
@@ -52,16 +164,105 @@ class EmbeddingModel:
         )
         last_hidden = outputs[0]
 
-        mask = attention_mask[..., None]
-        pooled = (last_hidden * mask).sum(axis=1) / mask.sum(axis=1)
+        mask = attention_mask[..., None].astype(last_hidden.dtype)
+        pooled = (last_hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1.0)
+
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return pooled / np.where(norms > 0, norms, 1.0)
+
+    def _embed_group(self, ids: List[List[int]], masks: List[List[int]]) -> np.ndarray:
+        padded = self.tokenizer.pad(
+            {"input_ids": ids, "attention_mask": masks},
+            padding="longest",
+            return_tensors="np",
+        )
+        return self._forward(padded["input_ids"], padded["attention_mask"])
+
+    async def tokenize(self, text: str, max_length=512):
+        await self.ensure_loaded()
+        return await inference_executor.run(
+            self.tokenizer,
+            text,
+            return_tensors="np",
+            truncation=True,
+            padding="longest",
+            max_length=max_length,
+        )
+
+    async def embed_batch(
+        self, texts: List[str], batch_size: int = DEFAULT_BATCH_SIZE, max_length=512
+    ) -> np.ndarray:
+        """
+        Embed many texts with length-sorted dynamic padding.
+
+        Texts are tokenized once without padding, sorted by token count and
+        grouped so every batch is only padded to its own longest member.
+        Each group is a separate executor job so interactive queries can
+        interleave with a long ingestion. Returns a float32 array with one
+        row per text, in input order.
+        """
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+
+        await self.ensure_loaded()
+        encoded = await inference_executor.run(
+            self.tokenizer, texts, truncation=True, max_length=max_length
+        )
+        return await self._embed_encoded(
+            encoded["input_ids"], encoded["attention_mask"], batch_size
+        )
+
+    async def embed_token_ids(
+        self, input_ids: List[List[int]], batch_size: int = DEFAULT_BATCH_SIZE
+    ) -> np.ndarray:
+        """Embed texts that were already tokenized (special tokens included), e.g. TokenChunk.input_ids."""
+        if not input_ids:
+            return np.empty((0, 0), dtype=np.float32)
+
+        await self.ensure_loaded()
+        masks = [[1] * len(ids) for ids in input_ids]
+        return await self._embed_encoded(input_ids, masks, batch_size)
+
+    async def _embed_encoded(
+        self, ids: List[List[int]], masks: List[List[int]], batch_size: int
+    ) -> np.ndarray:
+        order = sorted(range(len(ids)), key=lambda i: len(ids[i]))
+        result = None
+
+        for start in range(0, len(order), batch_size):
+            group = order[start:start + batch_size]
+            vectors = await inference_executor.run(
+                self._embed_group,
+                [ids[i] for i in group],
+                [masks[i] for i in group],
+            )
+
+            if result is None:
+                result = np.empty((len(ids), vectors.shape[1]), dtype=np.float32)
+            result[group] = vectors
+
+        return result
+
+    async def embed_text(self, text: str, max_length=512) -> np.ndarray:
+        """Embed one query, served from the cache or a shared micro-batch."""
+        cached = self.cache.get(text, max_length)
+        if cached is not None:
+            return cached
 
-        vec = pooled[0]
+        vec = await self.batcher.submit(text, max_length=max_length)
+        self.cache.set(text, max_length, vec)
+        return vec
 
-        norm = np.linalg.norm(vec)
-        if norm > 0:
-            vec = vec / norm
+    async def warm_cache(self, queries: List[str] | None = None, max_length=512) -> int:
+        """Pre-embed frequent queries so their first request skips ONNX."""
+        queries = queries if queries is not None else load_warm_queries()
+        if not queries:
+            return 0
 
-        return vec.tolist()
+        vectors = await self.embed_batch(queries, max_length=max_length)
+        for query, vec in zip(queries, vectors):
+            self.cache.set(query, max_length, vec)
+        return len(queries)
 
 
 embedding_model = EmbeddingModel()
@@ -0,0 +1,6 @@
+class InferenceQueueFull(Exception):
+    """Raised when the inference executor already has its maximum number of jobs waiting."""
+
+
+class InferenceExecutorClosed(Exception):
+    """Raised when work is submitted after the inference executor was shut down."""
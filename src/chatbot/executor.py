@@ -0,0 +1,138 @@
+import asyncio
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Callable, TypeVar
+
+from .exceptions import InferenceExecutorClosed, InferenceQueueFull
+
+T = TypeVar("T")
+
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "2"))
+INFERENCE_MAX_PENDING = int(os.getenv("INFERENCE_MAX_PENDING", "64"))
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", "2"))
+
+
+def _cgroup_cpu_limit() -> float | None:
+    """CPUs allowed by the container's CFS quota (cgroup v2, then v1), if any."""
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        return None if quota == "max" else int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        return None if quota <= 0 else quota / period
+    except (OSError, ValueError):
+        return None
+
+
+def available_cpus() -> int:
+    """
+    CPUs this process may actually use.
+
+    os.cpu_count() reports the host's cores; containers (e.g. HF Spaces) are
+    limited by CPU affinity and/or a cgroup quota, so take the smaller.
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    limit = _cgroup_cpu_limit()
+    if limit is not None:
+        cpus = min(cpus, math.ceil(limit))
+    return max(1, cpus)
+
+
+# ONNX Runtime parallelises every session.run over its own intra-op pool, so
+# the cores are split between executor workers instead of oversubscribing.
+ORT_INTRA_OP_THREADS = int(
+    os.getenv(
+        "ORT_INTRA_OP_THREADS",
+        str(max(1, available_cpus() // max(1, INFERENCE_WORKERS))),
+    )
+)
+
+
+class InferenceExecutor:
+    """
+    Bounded thread pool for CPU-bound tokenizer / ONNX work.
+
+    Keeps model calls off the event loop so unrelated routes stay responsive,
+    and rejects new work with InferenceQueueFull once `max_pending` jobs are
+    queued or running.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._pool: ThreadPoolExecutor | None = None
+        self._pending = 0
+        self._closed = False
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="inference"
+            )
+        return self._pool
+
+    async def run(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        if self._closed:
+            raise InferenceExecutorClosed("Inference executor is shut down")
+        if self._pending >= self.max_pending:
+            raise InferenceQueueFull(
+                f"Inference queue is full ({self.max_pending} pending jobs)"
+            )
+
+        self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._get_pool(), partial(fn, *args, **kwargs)
+            )
+        finally:
+            self._pending -= 1
+
+    def shutdown(self, wait: bool = True):
+        self._closed = True
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait, cancel_futures=True)
+            self._pool = None
+
+
+inference_executor = InferenceExecutor(
+    max_workers=INFERENCE_WORKERS, max_pending=INFERENCE_MAX_PENDING
+)
+
+
+_extraction_pool: ProcessPoolExecutor | None = None
+
+
+def get_extraction_pool() -> ProcessPoolExecutor:
+    """Process pool for PyPDF2 page extraction, which holds the GIL."""
+    global _extraction_pool
+    if _extraction_pool is None:
+        # spawn, not fork: the parent already runs ORT and executor threads
+        _extraction_pool = ProcessPoolExecutor(
+            max_workers=PDF_EXTRACT_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _extraction_pool
+
+
+def shutdown_extraction_pool(wait: bool = True):
+    global _extraction_pool
+    if _extraction_pool is not None:
+        _extraction_pool.shutdown(wait=wait, cancel_futures=True)
+        _extraction_pool = None
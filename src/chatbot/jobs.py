@@ -0,0 +1,278 @@
+import asyncio
+import logging
+import os
+import shutil
+import socket
+import tempfile
+from datetime import datetime, timedelta
+from uuid import UUID, uuid4
+
+from sqlalchemy import delete, or_, select, update
+
+from src.core.database import async_session
+from .cache import search_cache
+from .models import IngestionJob, IngestionJobStatus, KnowledgeBase
+from .service import process_pdf_and_store, reindex_pdf
+
+INGEST_MAX_CONCURRENT_JOBS = int(os.getenv("INGEST_MAX_CONCURRENT_JOBS", "1"))
+INGEST_UPLOAD_DIR = os.getenv(
+    "INGEST_UPLOAD_DIR", os.path.join(tempfile.gettempdir(), "ingestion_uploads")
+)
+INGEST_HEARTBEAT_SECONDS = int(os.getenv("INGEST_HEARTBEAT_SECONDS", "30"))
+# A queued/running job whose owner has not heartbeated for this long is failed
+INGEST_STALE_AFTER_SECONDS = int(os.getenv("INGEST_STALE_AFTER_SECONDS", "180"))
+
+logger = logging.getLogger(__name__)
+
+
+async def _update_job(job_id: UUID, **values):
+    async with async_session() as session:
+        await session.execute(
+            update(IngestionJob).where(IngestionJob.id == job_id).values(**values)
+        )
+        await session.commit()
+
+
+class IngestionJobRunner:
+    """
+    Runs PDF ingestion as background asyncio tasks.
+
+    A job either streams a PDF into a new knowledge base or, when submitted
+    with a `kb_id`, re-ingests an updated PDF into that knowledge base,
+    re-embedding only the chunks whose content changed.
+
+    Uploads are spooled to INGEST_UPLOAD_DIR and tracked in `ingestion_jobs`;
+    at most `max_concurrent` jobs embed at once, the rest wait as queued so
+    ingestion cannot crowd interactive queries out of the inference executor.
+
+    Each job is stamped with this process's `owner` id and heartbeated while
+    it is queued or running, so several workers (or an old and a new one
+    during a rolling restart) can share the table: recovery only touches
+    jobs whose owner has gone quiet.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int,
+        upload_dir: str,
+        heartbeat_seconds: int = INGEST_HEARTBEAT_SECONDS,
+        stale_after_seconds: int = INGEST_STALE_AFTER_SECONDS,
+    ):
+        self.max_concurrent = max(max_concurrent, 1)
+        self.upload_dir = upload_dir
+        self.heartbeat_seconds = heartbeat_seconds
+        self.stale_after = timedelta(seconds=stale_after_seconds)
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+        self._semaphore: asyncio.Semaphore | None = None
+        self._tasks: set[asyncio.Task] = set()
+        self._heartbeat_task: asyncio.Task | None = None
+
+    def _upload_path(self, job_id: UUID) -> str:
+        return os.path.join(self.upload_dir, f"{job_id}.pdf")
+
+    async def submit_pdf(
+        self,
+        fileobj,
+        filename: str,
+        kb_name: str,
+        kb_description: str | None,
+        kb_id: UUID | None = None,
+    ) -> IngestionJob:
+        job = IngestionJob(
+            kb_id=kb_id,
+            kb_name=kb_name,
+            kb_description=kb_description,
+            filename=filename,
+            reindex=kb_id is not None,
+            owner=self.owner,
+            heartbeat_at=datetime.now(),
+        )
+        path = self._upload_path(job.id)
+        os.makedirs(self.upload_dir, exist_ok=True)
+
+        def spool():
+            with open(path, "wb") as out_f:
+                shutil.copyfileobj(fileobj, out_f)
+
+        await asyncio.to_thread(spool)
+
+        async with async_session() as session:
+            session.add(job)
+            await session.commit()
+            await session.refresh(job)
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+
+        task = asyncio.create_task(self._run(job.id, path))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    async def _run(self, job_id: UUID, path: str):
+        kb_id = None
+
+        async def on_progress(new_kb_id: UUID, chunks_stored: int):
+            nonlocal kb_id
+            kb_id = new_kb_id
+            await _update_job(job_id, kb_id=new_kb_id, chunks_processed=chunks_stored)
+
+        try:
+            async with self._semaphore:
+                await _update_job(
+                    job_id, status=IngestionJobStatus.RUNNING, started_at=datetime.now()
+                )
+                async with async_session() as session:
+                    job = await session.get(IngestionJob, job_id)
+                    with open(path, "rb") as fobj:
+                        if job.reindex:
+                            # One transaction: a failure leaves the KB as it was
+                            result = await reindex_pdf(fobj, job.kb_id, session)
+                            chunks_processed = result["chunks_total"]
+                        else:
+                            result = await process_pdf_and_store(
+                                fobj,
+                                job.kb_name,
+                                job.kb_description,
+                                session,
+                                on_progress=on_progress,
+                            )
+                            chunks_processed = result["chunks_stored"]
+
+            await _update_job(
+                job_id,
+                status=IngestionJobStatus.DONE,
+                chunks_processed=chunks_processed,
+                finished_at=datetime.now(),
+            )
+        except Exception as e:
+            logger.exception("Ingestion job %s failed", job_id)
+            await self._fail(job_id, kb_id, str(e) or type(e).__name__)
+        except asyncio.CancelledError:
+            await self._fail(job_id, kb_id, "Cancelled by server shutdown")
+            raise
+        finally:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    async def _fail(self, job_id: UUID, kb_id: UUID | None, error: str):
+        # `kb_id` is only set for a knowledge base this job created; its chunks
+        # were never committed, so drop it (the FK clears the job's kb_id)
+        async with async_session() as session:
+            if kb_id is not None:
+                await session.execute(
+                    delete(KnowledgeBase).where(KnowledgeBase.id == kb_id)
+                )
+            await session.execute(
+                update(IngestionJob)
+                .where(IngestionJob.id == job_id)
+                .values(
+                    status=IngestionJobStatus.FAILED,
+                    error=error,
+                    finished_at=datetime.now(),
+                )
+            )
+            await session.commit()
+        if kb_id is not None:
+            search_cache.invalidate(kb_id)
+
+    async def _fail_stale_jobs(self) -> int:
+        """
+        Fail queued/running jobs whose owner stopped heartbeating.
+
+        Rows are claimed with FOR UPDATE SKIP LOCKED, so two processes
+        recovering at once never handle the same job, and only the uploads of
+        the claimed jobs are removed. Knowledge bases created by the claimed
+        jobs are dropped; those being reindexed are left as they were, since
+        a reindex commits in one transaction.
+        """
+        cutoff = datetime.now() - self.stale_after
+        async with async_session() as session:
+            stale = (
+                await session.execute(
+                    select(IngestionJob.id, IngestionJob.kb_id, IngestionJob.reindex)
+                    .where(
+                        IngestionJob.status.in_(
+                            [IngestionJobStatus.QUEUED, IngestionJobStatus.RUNNING]
+                        ),
+                        IngestionJob.owner.is_distinct_from(self.owner),
+                        or_(
+                            IngestionJob.heartbeat_at.is_(None),
+                            IngestionJob.heartbeat_at < cutoff,
+                        ),
+                    )
+                    .with_for_update(skip_locked=True)
+                )
+            ).all()
+            if not stale:
+                return 0
+
+            kb_ids = [
+                kb_id for _, kb_id, reindex in stale if kb_id is not None and not reindex
+            ]
+            if kb_ids:
+                await session.execute(
+                    delete(KnowledgeBase).where(KnowledgeBase.id.in_(kb_ids))
+                )
+            await session.execute(
+                update(IngestionJob)
+                .where(IngestionJob.id.in_([job_id for job_id, _, _ in stale]))
+                .values(
+                    status=IngestionJobStatus.FAILED,
+                    error="Interrupted: the worker running it stopped",
+                    finished_at=datetime.now(),
+                )
+            )
+            await session.commit()
+
+        for kb_id in kb_ids:
+            search_cache.invalidate(kb_id)
+        for job_id, _, _ in stale:
+            try:
+                os.remove(self._upload_path(job_id))
+            except OSError:
+                pass
+        return len(stale)
+
+    async def _heartbeat(self):
+        while True:
+            try:
+                async with async_session() as session:
+                    await session.execute(
+                        update(IngestionJob)
+                        .where(
+                            IngestionJob.owner == self.owner,
+                            IngestionJob.status.in_(
+                                [IngestionJobStatus.QUEUED, IngestionJobStatus.RUNNING]
+                            ),
+                        )
+                        .values(heartbeat_at=datetime.now())
+                    )
+                    await session.commit()
+                # Also picks up jobs of workers that died while this one runs
+                await self._fail_stale_jobs()
+            except Exception:
+                logger.exception("Ingestion heartbeat failed")
+            await asyncio.sleep(self.heartbeat_seconds)
+
+    async def recover(self):
+        """Fail jobs abandoned by stopped processes and start this process's heartbeat."""
+        failed = await self._fail_stale_jobs()
+        if failed:
+            logger.warning("Failed %d ingestion job(s) left by stopped workers", failed)
+        if self._heartbeat_task is None:
+            self._heartbeat_task = asyncio.create_task(self._heartbeat())
+
+    async def shutdown(self):
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+ingestion_runner = IngestionJobRunner(
+    max_concurrent=INGEST_MAX_CONCURRENT_JOBS, upload_dir=INGEST_UPLOAD_DIR
+)
@@ -1,12 +1,28 @@
+import os
 import uuid
 from datetime import datetime
+from enum import Enum
 from typing import List
 
-from pgvector.sqlalchemy import Vector
-from sqlalchemy import Column
+from sqlalchemy import Column, Computed, Index
 from sqlmodel import Field, Relationship, SQLModel, ForeignKey
 
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import TSVECTOR, UUID
+
+from src.core.vector import BinaryHalfVector, BinaryVector
+
+# "halfvec" stores float16 (half the table and index size, pgvector >= 0.7);
+# "vector" keeps float32 for databases still below migration e4a9c1d7b265
+EMBEDDING_STORAGE = (
+    "halfvec" if os.getenv("EMBEDDING_STORAGE", "halfvec").lower() == "halfvec" else "vector"
+)
+EmbeddingColumn = BinaryHalfVector if EMBEDDING_STORAGE == "halfvec" else BinaryVector
+# Operator class matching the `<#>` (negative inner product) search operator
+EMBEDDING_IP_OPS = f"{EMBEDDING_STORAGE}_ip_ops"
+
+EMBEDDING_DIM = 768
+# Matryoshka prefix of the embedding used for the coarse search stage
+COARSE_EMBEDDING_DIM = 256
 
 
 class KnowledgeBase(SQLModel, table=True):
@@ -32,5 +48,66 @@ class KnowledgeChunk(SQLModel, table=True):
     chunk_index: int
     chunk_text: str
     image_url: str | None = Field(default=None)
-    embedding: List[float] = Field(sa_column=Column(Vector(768)))
+    # sha256 of chunk_text, used to skip re-embedding unchanged chunks on reindex
+    content_hash: str | None = Field(default=None)
+    embedding: List[float] = Field(sa_column=Column(EmbeddingColumn(EMBEDDING_DIM)))
+    embedding_coarse: List[float] | None = Field(
+        default=None, sa_column=Column(EmbeddingColumn(COARSE_EMBEDDING_DIM))
+    )
+    chunk_tsv: str | None = Field(
+        default=None,
+        sa_column=Column(
+            TSVECTOR,
+            Computed("to_tsvector('english', chunk_text)", persisted=True),
+        ),
+    )
     knowledge_base: "KnowledgeBase" = Relationship(back_populates="knowledge_chunk")
+    # Only the coarse column is HNSW-indexed: searches take candidates from it
+    # and re-score them on the full vectors, so a 768-dim graph is not kept
+    __table_args__ = (
+        Index(
+            "ix_knowledge_chunk_embedding_coarse_hnsw",
+            "embedding_coarse",
+            postgresql_using="hnsw",
+            postgresql_with={"m": 16, "ef_construction": 64},
+            postgresql_ops={"embedding_coarse": EMBEDDING_IP_OPS},
+        ),
+        Index("ix_knowledge_chunk_chunk_tsv", "chunk_tsv", postgresql_using="gin"),
+        Index("ix_knowledge_chunk_kb_id_content_hash", "kb_id", "content_hash"),
+        Index("ix_knowledge_chunk_kb_id_chunk_index", "kb_id", "chunk_index"),
+    )
+
+
+class IngestionJobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
+class IngestionJob(SQLModel, table=True):
+    __tablename__ = "ingestion_jobs"
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    kb_id: uuid.UUID | None = Field(
+        default=None,
+        sa_column=Column(UUID(as_uuid=True),
+            ForeignKey("knowledge_base.id", ondelete="SET NULL"),
+            nullable=True
+        )
+    )
+    kb_name: str = Field(nullable=False)
+    kb_description: str | None = None
+    filename: str = Field(nullable=False)
+    status: IngestionJobStatus = Field(default=IngestionJobStatus.QUEUED)
+    chunks_processed: int = Field(default=0)
+    error: str | None = None
+    created_at: datetime = Field(default_factory=datetime.now)
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+    # Process running the job and its last sign of life; jobs whose owner
+    # stopped heartbeating are failed by another process's recover()
+    owner: str | None = None
+    heartbeat_at: datetime | None = None
+    # Re-ingests into an existing kb_id instead of creating a knowledge base,
+    # so a failed job must leave that knowledge base in place
+    reindex: bool = Field(default=False)
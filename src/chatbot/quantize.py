@@ -0,0 +1,210 @@
+"""
+INT8 embedding model: offline conversion and fp32 comparison benchmark.
+
+    python -m src.chatbot.quantize convert [--output assets/onnx/model_int8.onnx]
+    python -m src.chatbot.quantize benchmark [--corpus queries.txt] [--repeat 3]
+
+`convert` applies ONNX Runtime dynamic quantization (INT8 weights, activations
+quantized at run time) to the existing onnx/model.onnx. It needs the `onnx`
+package, which is only required on the machine doing the conversion.
+
+`benchmark` loads each variant in its own process so RSS is measured
+cleanly, embeds a fixed corpus and reports throughput, peak RSS and the
+cosine agreement between int8 and fp32 vectors. Serve the INT8 model with
+EMBEDDING_QUANTIZED=true once agreement is acceptable.
+"""
+import argparse
+import asyncio
+import multiprocessing as mp
+import os
+import queue
+import resource
+import time
+import traceback
+
+import numpy as np
+
+from .embedding import EMBEDDING_INT8_PATH, EmbeddingModel
+
+DEFAULT_CORPUS = [
+    "How many casual leaves do I get in a year?",
+    "What is the sick leave policy?",
+    "How do I apply for leave from the app?",
+    "Who approves my leave request?",
+    "Can I cancel a leave that was already approved?",
+    "When is the salary credited every month?",
+    "How do I download my payslip for the last three months?",
+    "What is the wifi password for the office?",
+    "Whom should I contact if my laptop is not working?",
+    "How do I return an asset when I leave the company?",
+    "What are the office working hours?",
+    "Is there a dress code at Yuvabe?",
+    "How do I update my address in my profile?",
+    "What should I do on my first day of onboarding?",
+    "How can I reset my password?",
+    "Where can I find the employee handbook?",
+    "What is the policy on working from home?",
+    "How are public holidays decided each year?",
+    "Who is my mentor and how do I reach them?",
+    "How do I log my water intake in the wellbeing section?",
+    "What is the process for reimbursement of travel expenses?",
+    "How long is the notice period?",
+    "Can unused leaves be carried forward to next year?",
+    "What happens if I exceed my sick leave limit?",
+    "How do I raise a request for a new monitor?",
+    "What is asset YB-73-M assigned to?",
+    "Where do I report harassment or misconduct?",
+    "What is the code of conduct for meetings?",
+    "How do I get access to the shared drive?",
+    "Who do I email for HR questions?",
+    "How often are performance reviews held?",
+    "Is there a policy for maternity and paternity leave?",
+]
+
+
+def convert(output: str = EMBEDDING_INT8_PATH):
+    try:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+    except ImportError as e:
+        raise SystemExit(f"Quantization needs the `onnx` package: {e}")
+
+    fp32_path = EmbeddingModel(quantized=False).resolve_fp32_path()
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+
+    quantize_dynamic(
+        model_input=fp32_path,
+        model_output=output,
+        weight_type=QuantType.QInt8,
+        per_channel=True,
+    )
+
+    fp32_size = os.path.getsize(fp32_path)
+    data_path = fp32_path + "_data"
+    if os.path.exists(data_path):
+        fp32_size += os.path.getsize(data_path)
+
+    print(f"fp32: {fp32_path} ({fp32_size / 2**20:.0f} MiB)")
+    print(f"int8: {output} ({os.path.getsize(output) / 2**20:.0f} MiB)")
+
+
+def _peak_rss_mib() -> float:
+    # ru_maxrss is reported in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _bench_variant(quantized: bool, corpus, repeat: int, int8_path: str, out):
+    try:
+        out.put(_bench(quantized, corpus, repeat, int8_path))
+    except BaseException as e:
+        # Hand the failure (e.g. a missing INT8 model) back to the parent
+        out.put({"error": e, "traceback": traceback.format_exc()})
+
+
+def _bench(quantized: bool, corpus, repeat: int, int8_path: str) -> dict:
+    model = EmbeddingModel(quantized=quantized, int8_path=int8_path)
+
+    async def run():
+        await model.ensure_loaded()
+        await model.embed_batch(corpus[:4])  # warm-up pass
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            vectors = await model.embed_batch(corpus)
+        elapsed = time.perf_counter() - start
+        return vectors, elapsed
+
+    vectors, elapsed = asyncio.run(run())
+    return {
+        "vectors": vectors,
+        "texts_per_sec": len(corpus) * repeat / elapsed,
+        "peak_rss_mib": _peak_rss_mib(),
+    }
+
+
+def _run_in_process(quantized: bool, corpus, repeat: int, int8_path: str) -> dict:
+    ctx = mp.get_context("spawn")
+    out = ctx.Queue()
+    proc = ctx.Process(
+        target=_bench_variant, args=(quantized, corpus, repeat, int8_path, out)
+    )
+    proc.start()
+
+    # Poll so a child that dies without reporting (killed, OOM) cannot hang us
+    result = None
+    while result is None:
+        try:
+            result = out.get(timeout=1)
+        except queue.Empty:
+            if proc.is_alive():
+                continue
+            try:
+                # It may have reported just before exiting
+                result = out.get(timeout=1)
+            except queue.Empty:
+                variant = "int8" if quantized else "fp32"
+                raise RuntimeError(
+                    f"{variant} benchmark process exited with code "
+                    f"{proc.exitcode} without a result"
+                )
+    proc.join()
+
+    if "error" in result:
+        print(result["traceback"])
+        raise result["error"]
+    return result
+
+
+def benchmark(corpus, repeat: int = 3, int8_path: str = EMBEDDING_INT8_PATH):
+    fp32 = _run_in_process(False, corpus, repeat, int8_path)
+    int8 = _run_in_process(True, corpus, repeat, int8_path)
+
+    # Vectors are L2-normalised, so the row-wise dot product is the cosine
+    cosine = np.sum(fp32["vectors"] * int8["vectors"], axis=1)
+
+    # Retrieval agreement: does each text's nearest neighbour stay the same?
+    def nearest(vectors):
+        sims = vectors @ vectors.T
+        np.fill_diagonal(sims, -np.inf)
+        return sims.argmax(axis=1)
+
+    nn_agreement = float(np.mean(nearest(fp32["vectors"]) == nearest(int8["vectors"])))
+
+    print(f"corpus: {len(corpus)} texts x {repeat} passes")
+    print(f"{'variant':<8}{'texts/s':>10}{'peak RSS MiB':>15}")
+    for name, r in (("fp32", fp32), ("int8", int8)):
+        print(f"{name:<8}{r['texts_per_sec']:>10.1f}{r['peak_rss_mib']:>15.0f}")
+    print(
+        f"speedup x{int8['texts_per_sec'] / fp32['texts_per_sec']:.2f}, "
+        f"memory x{int8['peak_rss_mib'] / fp32['peak_rss_mib']:.2f}"
+    )
+    print(
+        f"cosine(fp32, int8): mean {cosine.mean():.4f}, "
+        f"min {cosine.min():.4f}, p05 {np.percentile(cosine, 5):.4f}"
+    )
+    print(f"nearest-neighbour agreement: {nn_agreement:.3f}")
+
+
+def _load_corpus(path: str | None):
+    if not path:
+        return DEFAULT_CORPUS
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="INT8 embedding model tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    convert_cmd = sub.add_parser("convert", help="quantize onnx/model.onnx to INT8")
+    convert_cmd.add_argument("--output", default=EMBEDDING_INT8_PATH)
+
+    bench_cmd = sub.add_parser("benchmark", help="compare int8 against fp32")
+    bench_cmd.add_argument("--corpus", help="text file, one passage per line")
+    bench_cmd.add_argument("--repeat", type=int, default=3)
+    bench_cmd.add_argument("--int8-path", default=EMBEDDING_INT8_PATH)
+
+    args = parser.parse_args()
+    if args.command == "convert":
+        convert(args.output)
+    else:
+        benchmark(_load_corpus(args.corpus), args.repeat, args.int8_path)
@@ -8,42 +8,74 @@ from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile
 from sqlalchemy import text
 from sqlmodel.ext.asyncio.session import AsyncSession
 
+from src.auth.dependencies import IdentityContext
 from src.auth.utils import get_current_user
 from src.core.database import get_async_session
-from .schemas import ManualTextRequest
-from .service import store_manual_text
+from .schemas import ManualTextBatchRequest, ManualTextRequest
+from .service import append_texts, store_manual_text
+from .cache import search_cache
+from .dependencies import require_kb_admin
 from .embedding import embedding_model
+from .exceptions import InferenceQueueFull
+from .executor import inference_executor
+from .jobs import ingestion_runner
+from .models import IngestionJob, KnowledgeBase
 from .schemas import (
+    IngestionJobResponse,
+    QueryRequest,
     SemanticSearchRequest,
     SemanticSearchResult,
     TokenizeRequest,
     TokenizeResponse,
-    UploadKBResponse,
 )
-from .service import process_pdf_and_store
+from .service import (
+    hybrid_search,
+    lexical_search,
+    search_chunks,
+)
 
 router = APIRouter(prefix="/chatbot", tags=["chatbot"])
 
+
+def _to_search_results(rows) -> list[SemanticSearchResult]:
+    return [
+        SemanticSearchResult(
+            chunk_id=str(r.id),
+            kb_id=str(r.kb_id),
+            text=r.chunk_text,
+            image_url=r.image_url,
+            score=float(r.score),
+        )
+        for r in rows
+    ]
+
+
 @router.post("/tokenize", response_model=TokenizeResponse)
 async def tokenize_text(payload: TokenizeRequest,user_id: UUID = Depends(get_current_user)):
     try:
-        encoded = embedding_model.tokenizer(
-            payload.text,
-            return_tensors="np",
-            truncation=True,
-            padding="longest",
-            max_length=512,
-        )
+        encoded = await embedding_model.tokenize(payload.text, max_length=512)
 
         return TokenizeResponse(
             input_ids=encoded["input_ids"][0].tolist(),
             attention_mask=encoded["attention_mask"][0].tolist(),
         )
 
+    except InferenceQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/metrics")
+async def embedding_metrics(user_id: UUID = Depends(get_current_user)):
+    return {
+        "micro_batching": embedding_model.batcher.metrics.snapshot(),
+        "embedding_cache": embedding_model.cache.stats(),
+        "search_cache": search_cache.stats(),
+        "inference_pending": inference_executor.pending,
+    }
+
+
 @router.post("/semantic-search", response_model=list[SemanticSearchResult])
 async def semantic_search(
     payload: SemanticSearchRequest, session: AsyncSession = Depends(get_async_session), user_id: UUID = Depends(get_current_user)
@@ -52,70 +84,152 @@ async def semantic_search(
     if len(payload.embedding) == 0:
         raise HTTPException(status_code=400, detail="Embedding cannot be empty.")
 
-    q_vector = payload.embedding
+    rows = await search_chunks(
+        session,
+        payload.embedding,
+        top_k=payload.top_k or 3,
+        kb_ids=payload.kb_ids,
+        ef_search=payload.ef_search,
+        has_image=payload.has_image,
+    )
+
+    return _to_search_results(rows)
+
+
+@router.post("/query", response_model=list[SemanticSearchResult])
+async def query_knowledge_base(
+    payload: QueryRequest, session: AsyncSession = Depends(get_async_session), user_id: UUID = Depends(get_current_user)
+):
+    if not payload.text.strip():
+        raise HTTPException(status_code=400, detail="Query text cannot be empty.")
+
     top_k = payload.top_k or 3
+    kb_ids = list(payload.kb_ids or [])
+    if payload.kb_id is not None:
+        kb_ids.append(payload.kb_id)
 
-    q_vector_str = "[" + ",".join(str(x) for x in q_vector) + "]"
+    if payload.mode == "lexical":
+        rows = await lexical_search(
+            session, payload.text, top_k, kb_ids, payload.has_image
+        )
+    elif payload.mode == "hybrid":
+        rows = await hybrid_search(
+            session,
+            payload.text,
+            top_k=top_k,
+            kb_ids=kb_ids,
+            score_threshold=payload.score_threshold,
+            ef_search=payload.ef_search,
+            has_image=payload.has_image,
+        )
+    else:
+        try:
+            q_vector = await embedding_model.embed_text(payload.text)
+        except InferenceQueueFull as e:
+            raise HTTPException(status_code=503, detail=str(e))
+
+        rows = await search_chunks(
+            session,
+            q_vector,
+            top_k=top_k,
+            kb_ids=kb_ids,
+            score_threshold=payload.score_threshold,
+            ef_search=payload.ef_search,
+            has_image=payload.has_image,
+        )
+
+    return _to_search_results(rows)
 
-    sql = text(
-        """
-        SELECT id, kb_id, chunk_text,image_url,
-           embedding <#> :query_vec AS score
-        FROM knowledge_chunk
-        ORDER BY embedding <#> :query_vec ASC
-        LIMIT :top_k
-        """
-    )
 
-    result = await session.execute(
-        sql, {"query_vec": q_vector_str, "top_k": top_k}
+def _to_job_response(job: IngestionJob) -> IngestionJobResponse:
+    return IngestionJobResponse(
+        job_id=job.id,
+        kb_id=job.kb_id,
+        kb_name=job.kb_name,
+        filename=job.filename,
+        reindex=job.reindex,
+        status=job.status,
+        chunks_processed=job.chunks_processed,
+        error=job.error,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
     )
-    rows = result.fetchall()
-    
-    return [
-        SemanticSearchResult(
-            chunk_id=str(r.id),
-            kb_id=str(r.kb_id),
-            text=r.chunk_text,
-            image_url=r.image_url,
-            score=float(r.score),
-        )
-        for r in rows
-    ]
+
 
 # before hitting this endpoint make sure the model.data & model.onnx_data is available on the asset/onnx folder
-# @router.post("/upload-pdf", response_model=UploadKBResponse)
-# async def upload_pdf(
-#     file: UploadFile = File(...),
-#     name: str = Form(...),
-#     description: Optional[str] = Form(None),
-#     session: AsyncSession = Depends(get_async_session),
-# ):
-#     if not file.filename.endswith(".pdf"):
-#         raise HTTPException(
-#             status_code=400, detail="Only PDF files are supported for now."
-#         )
+@router.post("/upload-pdf", response_model=IngestionJobResponse, status_code=202)
+async def upload_pdf(
+    file: UploadFile = File(...),
+    name: str = Form(...),
+    description: Optional[str] = Form(None),
+    identity: IdentityContext = Depends(require_kb_admin),
+):
+    if not file.filename.endswith(".pdf"):
+        raise HTTPException(
+            status_code=400, detail="Only PDF files are supported for now."
+        )
 
-#     tmp_dir = tempfile.mkdtemp()
-#     tmp_path = os.path.join(tmp_dir, file.filename)
-#     try:
-#         with open(tmp_path, "wb") as out_f:
-#             shutil.copyfileobj(file.file, out_f)
+    job = await ingestion_runner.submit_pdf(file.file, file.filename, name, description)
+    return _to_job_response(job)
 
-#         with open(tmp_path, "rb") as fobj:
-#             result = await process_pdf_and_store(fobj, name, description, session)
 
-#         return UploadKBResponse(
-#             kb_id=result["kb_id"],
-#             name=result["name"],
-#             chunks_stored=result["chunks_stored"],
-#         )
-#     finally:
-#         try:
-#             os.remove(tmp_path)
-#             os.rmdir(tmp_dir)
-#         except Exception:
-#             pass
+@router.post(
+    "/knowledge-bases/{kb_id}/reindex",
+    response_model=IngestionJobResponse,
+    status_code=202,
+)
+async def reindex_knowledge_base(
+    kb_id: UUID,
+    file: UploadFile = File(...),
+    session: AsyncSession = Depends(get_async_session),
+    identity: IdentityContext = Depends(require_kb_admin),
+):
+    """Re-ingest an updated PDF into an existing KB; unchanged chunks keep their embeddings."""
+    if not file.filename.endswith(".pdf"):
+        raise HTTPException(
+            status_code=400, detail="Only PDF files are supported for now."
+        )
+    kb = await session.get(KnowledgeBase, kb_id)
+    if not kb:
+        raise HTTPException(status_code=404, detail="Knowledge base not found")
+
+    job = await ingestion_runner.submit_pdf(
+        file.file, file.filename, kb.name, kb.description, kb_id=kb_id
+    )
+    return _to_job_response(job)
+
+
+@router.get("/ingestion-jobs/{job_id}", response_model=IngestionJobResponse)
+async def get_ingestion_job(
+    job_id: UUID, session: AsyncSession = Depends(get_async_session), user_id: UUID = Depends(get_current_user)
+):
+    job = await session.get(IngestionJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Ingestion job not found")
+    return _to_job_response(job)
+
+
+@router.post("/append-chunks")
+async def append_chunks(
+    payload: ManualTextBatchRequest,
+    session: AsyncSession = Depends(get_async_session),
+    identity: IdentityContext = Depends(require_kb_admin),
+):
+    texts = [t for t in payload.texts if t.strip()]
+    if not texts:
+        raise HTTPException(status_code=400, detail="No text to append")
+    # Checked before embedding, so a bad kb_id costs no inference
+    if not await session.get(KnowledgeBase, payload.kb_id):
+        raise HTTPException(status_code=404, detail="Knowledge base not found")
+
+    try:
+        return await append_texts(payload.kb_id, texts, session)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except InferenceQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
 
 # @router.post("/manual-add-chunk")
 # async def manual_add_chunk(
@@ -137,8 +251,6 @@ async def semantic_search(
 
 #     embedding = await embedding_model.embed_text(query)
 
-#     q_vec = "[" + ",".join(map(str, embedding)) + "]"
-
 #     sql = text("""
 #         SELECT id, kb_id, chunk_text,
 #                embedding <#> :vec AS score
@@ -147,7 +259,7 @@ async def semantic_search(
 #         LIMIT :k
 #     """)
 
-#     result = await session.execute(sql, {"vec": q_vec, "k": top_k})
+#     result = await session.execute(sql, {"vec": embedding, "k": top_k})
 #     rows = result.fetchall()
 
 #     return [
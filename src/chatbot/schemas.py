@@ -1,8 +1,11 @@
 import uuid
-from typing import List, Optional
+from datetime import datetime
+from typing import List, Literal, Optional
 
 from pydantic import BaseModel
 
+from .models import IngestionJobStatus
+
 
 class UploadKBResponse(BaseModel):
     kb_id: uuid.UUID
@@ -10,6 +13,20 @@ class UploadKBResponse(BaseModel):
     chunks_stored: int
 
 
+class IngestionJobResponse(BaseModel):
+    job_id: uuid.UUID
+    kb_id: Optional[uuid.UUID] = None
+    kb_name: str
+    filename: str
+    reindex: bool = False
+    status: IngestionJobStatus
+    chunks_processed: int
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+
 class UploadKBRequest(BaseModel):
     name: str
     description: Optional[str] = None
@@ -27,6 +44,24 @@ class TokenizeResponse(BaseModel):
 class SemanticSearchRequest(BaseModel):
     embedding: List[float]
     top_k: Optional[int] = 3
+    ef_search: Optional[int] = None
+    # Restrict the search to these knowledge bases (all when empty)
+    kb_ids: Optional[List[uuid.UUID]] = None
+    # Only chunks with (True) or without (False) an image
+    has_image: Optional[bool] = None
+
+
+class QueryRequest(BaseModel):
+    text: str
+    top_k: Optional[int] = 3
+    kb_id: Optional[uuid.UUID] = None
+    kb_ids: Optional[List[uuid.UUID]] = None
+    has_image: Optional[bool] = None
+    # Scores are negative inner products (lower is closer); hits above this are dropped
+    score_threshold: Optional[float] = None
+    ef_search: Optional[int] = None
+    # vector: embedding search only, lexical: full-text only, hybrid: both fused with RRF
+    mode: Literal["vector", "lexical", "hybrid"] = "vector"
 
 
 class SemanticSearchResult(BaseModel):
@@ -39,3 +74,8 @@ class SemanticSearchResult(BaseModel):
 class ManualTextRequest(BaseModel):
     kb_id: uuid.UUID
     text: str
+
+
+class ManualTextBatchRequest(BaseModel):
+    kb_id: uuid.UUID
+    texts: List[str]
@@ -1,71 +1,562 @@
+import asyncio
 import os
-from uuid import UUID
+import shutil
+import tempfile
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from uuid import UUID, uuid4
+import numpy as np
+from typing import Awaitable, Callable, List, NamedTuple, Sequence
+from sqlalchemy import delete, func, update
+from sqlalchemy import text as sql_text
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlmodel import select
-from .embedding import embedding_model
-from .models import KnowledgeBase, KnowledgeChunk
+from src.core.database import async_session
+from .cache import search_cache
+from .embedding import embedding_model, truncate_embeddings
+from .exceptions import InferenceQueueFull
+from .executor import get_extraction_pool
+from .models import COARSE_EMBEDDING_DIM, KnowledgeBase, KnowledgeChunk
 from .utils import (
-    chunk_sentences_with_overlap,
-    extract_text_from_pdf_fileobj,
-    split_into_sentences,
+    TokenChunk,
+    TokenChunker,
+    content_hash,
+    iter_pdf_chunks,
+    reciprocal_rank_fusion,
 )
 
-DEFAULT_MAX_WORDS = int(os.getenv("CHUNK_MAX_WORDS", "200"))
-DEFAULT_OVERLAP = int(os.getenv("CHUNK_OVERLAP_WORDS", "40"))
+# Chunk size in model tokens, special tokens included; embeddings see whole chunks
+DEFAULT_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "256"))
+DEFAULT_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "48"))
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "64"))
+DEFAULT_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "40"))
+# Two-stage search: coarse candidates from the truncated index, re-scored on full vectors.
+# Only the coarse column has an HNSW index, so single-stage search is an exact scan.
+SEARCH_TWO_STAGE = os.getenv("SEARCH_TWO_STAGE", "true").lower() == "true"
+SEARCH_COARSE_CANDIDATES = int(os.getenv("SEARCH_COARSE_CANDIDATES", "100"))
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))
+RRF_K = int(os.getenv("RRF_K", "60"))
 
 
-async def process_pdf_and_store(
-    fileobj, kb_name: str, kb_description: str | None, session: AsyncSession
-):
-    raw_text = extract_text_from_pdf_fileobj(fileobj)
+class SearchHit(NamedTuple):
+    id: UUID
+    kb_id: UUID
+    chunk_text: str
+    image_url: str | None
+    score: float
+
+
+@contextmanager
+def _pdf_path(fileobj):
+    """Worker processes open the PDF by path; spill file-like objects to disk if needed."""
+    name = getattr(fileobj, "name", None)
+    if isinstance(name, str) and os.path.isfile(name):
+        yield name
+        return
+
+    with tempfile.NamedTemporaryFile(suffix=".pdf") as tmp:
+        shutil.copyfileobj(fileobj, tmp)
+        tmp.flush()
+        yield tmp.name
+
+
+CHUNK_COPY_COLUMNS = (
+    "id",
+    "kb_id",
+    "chunk_index",
+    "chunk_text",
+    "image_url",
+    "content_hash",
+    "embedding",
+    "embedding_coarse",
+)
+
+
+async def copy_chunks(
+    session: AsyncSession,
+    kb_id: UUID,
+    indexed_texts: List[tuple[int, str]],
+    embeddings: np.ndarray,
+) -> int:
+    """
+    Bulk-insert chunk rows with COPY inside the session's transaction.
+
+    `indexed_texts` pairs each chunk_index with its text; `embeddings` has
+    one row per pair. Vectors go through the binary pgvector codec, so no
+    per-row INSERT or text encoding is built. Returns the number of rows.
+    """
+    if not indexed_texts:
+        return 0
+
+    coarse = truncate_embeddings(embeddings, COARSE_EMBEDDING_DIM)
+    records = [
+        (
+            uuid4(),
+            kb_id,
+            chunk_index,
+            chunk_text,
+            None,
+            content_hash(chunk_text),
+            embeddings[i],
+            coarse[i],
+        )
+        for i, (chunk_index, chunk_text) in enumerate(indexed_texts)
+    ]
+
+    conn = await session.connection()
+    raw = await conn.get_raw_connection()
+    await raw.driver_connection.copy_records_to_table(
+        KnowledgeChunk.__tablename__, records=records, columns=CHUNK_COPY_COLUMNS
+    )
+    return len(records)
+
+
+async def _iter_batches(chunks, size: int):
+    batch = []
+    async for chunk in chunks:
+        batch.append(chunk)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
 
-    sentences = split_into_sentences(raw_text)
 
-    chunks = chunk_sentences_with_overlap(
-        sentences, max_words=DEFAULT_MAX_WORDS, overlap_words=DEFAULT_OVERLAP
+async def _pdf_chunker() -> TokenChunker:
+    await embedding_model.ensure_loaded()
+    return TokenChunker(
+        embedding_model.tokenizer,
+        max_tokens=DEFAULT_MAX_TOKENS,
+        overlap_tokens=DEFAULT_OVERLAP_TOKENS,
     )
 
+
+async def process_pdf_and_store(
+    fileobj,
+    kb_name: str,
+    kb_description: str | None,
+    session: AsyncSession,
+    on_progress: Callable[[UUID, int], Awaitable[None]] | None = None,
+):
+    """
+    Stream a PDF into a new knowledge base.
+
+    Pages are extracted in a process pool ahead of the consumer; cleaned
+    sentences are packed into token-budgeted chunks as they arrive and every
+    INGEST_BATCH_SIZE chunks are embedded and COPY'd, so memory stays bounded
+    for large handbooks.
+    `on_progress(kb_id, chunks_stored)` is awaited after each batch.
+    """
     kb = KnowledgeBase(name=kb_name, description=kb_description)
     session.add(kb)
     await session.commit()
     await session.refresh(kb)
+    kb_id = kb.id
+    if on_progress is not None:
+        await on_progress(kb_id, 0)
+
+    chunks_stored = 0
+    with _pdf_path(fileobj) as path:
+        chunks = iter_pdf_chunks(path, get_extraction_pool(), await _pdf_chunker())
+        async for batch in _iter_batches(chunks, INGEST_BATCH_SIZE):
+            # Chunks carry their token ids, so the text is not tokenized again
+            embeddings = await embedding_model.embed_token_ids(
+                [chunk.input_ids for chunk in batch]
+            )
+            chunks_stored += await copy_chunks(
+                session,
+                kb_id,
+                list(enumerate((chunk.text for chunk in batch), start=chunks_stored)),
+                embeddings,
+            )
+            if on_progress is not None:
+                await on_progress(kb_id, chunks_stored)
+
+    await session.commit()
+    search_cache.invalidate(kb_id)
+
+    return {"kb_id": kb_id, "name": kb_name, "chunks_stored": chunks_stored}
+
 
-    chunk_objs = []
-    for idx, chunk_text in enumerate(chunks):
-        emb = await embedding_model.embed_text(chunk_text)
+async def _lock_kb(session: AsyncSession, kb_id: UUID) -> KnowledgeBase:
+    """Row-lock the knowledge base so reindexes and appends to it run one at a time."""
+    kb = await session.get(KnowledgeBase, kb_id, with_for_update=True)
+    if not kb:
+        raise ValueError("Knowledge base not found")
+    return kb
 
-        chunk = KnowledgeChunk(
-            kb_id=kb.id, chunk_index=idx, chunk_text=chunk_text, embedding=emb
+
+async def reindex_pdf(fileobj, kb_id: UUID, session: AsyncSession):
+    """Re-ingest an updated PDF into an existing knowledge base, re-embedding only what changed."""
+    with _pdf_path(fileobj) as path:
+        chunks = [
+            chunk
+            async for chunk in iter_pdf_chunks(
+                path, get_extraction_pool(), await _pdf_chunker()
+            )
+        ]
+
+    return await reindex_chunks(kb_id, chunks, session)
+
+
+async def reindex_chunks(kb_id: UUID, chunks: List[TokenChunk], session: AsyncSession):
+    """
+    Make the KB's chunks equal `chunks`, in order, in a single transaction.
+
+    Existing rows are matched to new chunks by content hash (duplicates are
+    matched in order). Matched rows keep their embeddings and are only
+    renumbered; unmatched new chunks are embedded and inserted; rows left
+    over are deleted.
+    """
+    await _lock_kb(session, kb_id)
+
+    existing = (
+        await session.execute(
+            select(
+                KnowledgeChunk.id, KnowledgeChunk.content_hash, KnowledgeChunk.chunk_index
+            )
+            .where(KnowledgeChunk.kb_id == kb_id)
+            .order_by(KnowledgeChunk.chunk_index)
+        )
+    ).all()
+
+    available = defaultdict(deque)
+    for row_id, row_hash, row_index in existing:
+        available[row_hash].append((row_id, row_index))
+
+    renumbered = []
+    new_chunks = []
+    for idx, chunk in enumerate(chunks):
+        chunk_hash = content_hash(chunk.text)
+        if available[chunk_hash]:
+            row_id, old_index = available[chunk_hash].popleft()
+            if old_index != idx:
+                renumbered.append({"id": row_id, "chunk_index": idx})
+        else:
+            new_chunks.append((idx, chunk))
+
+    stale_ids = [row_id for rows in available.values() for row_id, _ in rows]
+
+    if stale_ids:
+        await session.execute(
+            delete(KnowledgeChunk).where(KnowledgeChunk.id.in_(stale_ids))
+        )
+    if renumbered:
+        await session.execute(update(KnowledgeChunk), renumbered)
+
+    for start in range(0, len(new_chunks), INGEST_BATCH_SIZE):
+        batch = new_chunks[start:start + INGEST_BATCH_SIZE]
+        embeddings = await embedding_model.embed_token_ids(
+            [chunk.input_ids for _, chunk in batch]
+        )
+        await copy_chunks(
+            session, kb_id, [(idx, chunk.text) for idx, chunk in batch], embeddings
         )
-        session.add(chunk)
-        chunk_objs.append(chunk)
 
     await session.commit()
+    search_cache.invalidate(kb_id)
 
-    return {"kb_id": kb.id, "name": kb_name, "chunks_stored": len(chunk_objs)}
+    return {
+        "kb_id": kb_id,
+        "chunks_total": len(chunks),
+        "unchanged": len(chunks) - len(new_chunks),
+        "added": len(new_chunks),
+        "removed": len(stale_ids),
+        "renumbered": len(renumbered),
+    }
 
-async def store_manual_text(kb_id: UUID, text: str, session: AsyncSession):
-    embedding = await embedding_model.embed_text(text)
 
-    result = await session.execute(
-        select(KnowledgeChunk).where(KnowledgeChunk.kb_id == kb_id)
-    )
-    existing = result.scalars().all()
-    next_index = len(existing)
-
-    new_chunk = KnowledgeChunk(
-        kb_id=kb_id,
-        chunk_index=next_index,
-        chunk_text=text,
-        embedding=embedding
-    )
+async def append_texts(kb_id: UUID, texts: List[str], session: AsyncSession):
+    """
+    Append texts to the end of a knowledge base as new chunks.
 
-    session.add(new_chunk)
+    Texts are embedded in one batch before any lock is taken; the next
+    chunk_index then comes from max(chunk_index) on the (kb_id, chunk_index)
+    index while the KB row is locked, so the cost does not grow with the KB.
+    """
+    embeddings = await embedding_model.embed_batch(texts)
+
+    await _lock_kb(session, kb_id)
+    last_index = (
+        await session.execute(
+            select(func.max(KnowledgeChunk.chunk_index)).where(
+                KnowledgeChunk.kb_id == kb_id
+            )
+        )
+    ).scalar()
+    first_index = 0 if last_index is None else last_index + 1
+
+    await copy_chunks(
+        session, kb_id, list(enumerate(texts, start=first_index)), embeddings
+    )
     await session.commit()
+    search_cache.invalidate(kb_id)
+
+    return {
+        "kb_id": kb_id,
+        "first_chunk_index": first_index,
+        "chunks_stored": len(texts),
+    }
+
+
+async def store_manual_text(kb_id: UUID, text: str, session: AsyncSession):
+    result = await append_texts(kb_id, [text], session)
 
     return {
         "kb_id": kb_id,
-        "chunk_index": next_index,
+        "chunk_index": result["first_chunk_index"],
         "status": "stored",
         "text": text
     }
+
+
+def _where(filters: List[str]) -> str:
+    return f"WHERE {' AND '.join(filters)}" if filters else ""
+
+
+def _chunk_filters(
+    params: dict, kb_ids: Sequence[UUID] | None, has_image: bool | None
+) -> List[str]:
+    """SQL conditions (and their binds) restricting a search to some chunks."""
+    filters = []
+    if kb_ids:
+        filters.append("kb_id = ANY(:kb_ids)")
+        params["kb_ids"] = list(kb_ids)
+    if has_image is not None:
+        filters.append("image_url IS NOT NULL" if has_image else "image_url IS NULL")
+    return filters
+
+
+_iterative_scan: bool | None = None
+
+
+async def _supports_iterative_scan(session: AsyncSession) -> bool:
+    """pgvector >= 0.8 can keep walking the HNSW graph until enough rows pass the filters."""
+    global _iterative_scan
+    if _iterative_scan is None:
+        version = (
+            await session.execute(
+                sql_text("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+            )
+        ).scalar()
+        major_minor = tuple(int(p) for p in (version or "0.0").split(".")[:2])
+        _iterative_scan = major_minor >= (0, 8)
+    return _iterative_scan
+
+
+async def _set_local(session: AsyncSession, name: str, value: str):
+    # set_config(..., true) is SET LOCAL with binds
+    await session.execute(
+        sql_text("SELECT set_config(:name, :value, true)"),
+        {"name": name, "value": value},
+    )
+
+
+async def _count_matching(
+    session: AsyncSession, filters: List[str], params: dict, limit: int
+) -> int:
+    """Rows passing `filters`, counted up to `limit` (served by the kb_id btree index)."""
+    return (
+        await session.execute(
+            sql_text(
+                f"""
+                SELECT count(*) FROM (
+                    SELECT 1 FROM knowledge_chunk {_where(filters)} LIMIT :limit
+                ) matching
+                """
+            ),
+            {**params, "limit": limit},
+        )
+    ).scalar()
+
+
+async def search_chunks(
+    session: AsyncSession,
+    q_vector: np.ndarray | List[float],
+    top_k: int = 3,
+    kb_ids: Sequence[UUID] | None = None,
+    score_threshold: float | None = None,
+    ef_search: int | None = None,
+    two_stage: bool = SEARCH_TWO_STAGE,
+    has_image: bool | None = None,
+):
+    """
+    Nearest chunks by inner product, optionally restricted to `kb_ids` and
+    chunks with or without an image.
+
+    Filters are applied inside the index scan's query. On pgvector >= 0.8 the
+    HNSW scan is iterative, so it keeps going until enough rows match; if a
+    filtered search still comes back short of `top_k` while more rows match
+    the filters, it is re-run as an exact scan over the matching rows (kb_id
+    is served by its btree index).
+
+    Results are cached per query vector and options until a write to one of
+    the searched KBs (any KB when unscoped) bumps its version.
+    """
+    q_vector = np.asarray(q_vector, dtype=np.float32)
+    cache_key = search_cache.key(
+        q_vector, kb_ids, top_k, score_threshold, ef_search, two_stage, has_image
+    )
+    cached = search_cache.get(cache_key, kb_ids)
+    if cached is not None:
+        return cached
+    # Taken before the query so a write that lands meanwhile invalidates the entry
+    version = search_cache.version(kb_ids)
+
+    candidates = max(SEARCH_COARSE_CANDIDATES, top_k * 4)
+
+    # HNSW returns at most ef_search rows, so it must cover whatever the
+    # index stage has to produce.
+    ef = max(ef_search or DEFAULT_EF_SEARCH, candidates if two_stage else top_k)
+    await _set_local(session, "hnsw.ef_search", str(ef))
+
+    # Vectors are bound as float32 arrays through the asyncpg binary codec
+    params = {"query_vec": q_vector, "top_k": top_k}
+    filters = _chunk_filters(params, kb_ids, has_image)
+
+    exact_sql = sql_text(
+        f"""
+        SELECT id, kb_id, chunk_text, image_url,
+           embedding <#> :query_vec AS score
+        FROM knowledge_chunk
+        {_where(filters)}
+        ORDER BY embedding <#> :query_vec ASC
+        LIMIT :top_k
+        """
+    )
+
+    if two_stage:
+        params["coarse_vec"] = truncate_embeddings(q_vector, COARSE_EMBEDDING_DIM)
+        params["candidates"] = candidates
+        sql = sql_text(
+            f"""
+            WITH coarse AS (
+                SELECT id, kb_id, chunk_text, image_url, embedding
+                FROM knowledge_chunk
+                {_where(filters)}
+                ORDER BY embedding_coarse <#> :coarse_vec ASC
+                LIMIT :candidates
+            )
+            SELECT id, kb_id, chunk_text, image_url,
+               embedding <#> :query_vec AS score
+            FROM coarse
+            ORDER BY embedding <#> :query_vec ASC
+            LIMIT :top_k
+            """
+        )
+    else:
+        sql = exact_sql
+
+    if filters and await _supports_iterative_scan(session):
+        # The coarse stage is re-sorted on full vectors, so it can take relaxed order
+        await _set_local(
+            session, "hnsw.iterative_scan", "relaxed_order" if two_stage else "strict_order"
+        )
+
+    result = await session.execute(sql, params)
+    rows = result.fetchall()
+
+    # A short filtered result is normal for a small KB. It only means the
+    # index ran out of candidates when more rows pass the filters than it
+    # returned; then the search is repeated as an exact scan.
+    if filters and len(rows) < top_k and await _count_matching(
+        session, filters, params, top_k
+    ) > len(rows):
+        # set_config(..., true) lasts until the transaction ends; rolling
+        # back the savepoint restores whatever the session had before.
+        savepoint = await session.begin_nested()
+        try:
+            await _set_local(session, "enable_indexscan", "off")
+            rows = (await session.execute(exact_sql, params)).fetchall()
+        finally:
+            await savepoint.rollback()
+
+    # The threshold is applied after the scan (rows are ordered by score), so
+    # trimming by score never triggers the exact fallback above.
+    if score_threshold is not None:
+        rows = [row for row in rows if row.score <= score_threshold]
+
+    search_cache.set(cache_key, version, rows)
+    return rows
+
+
+async def lexical_search(
+    session: AsyncSession,
+    query_text: str,
+    top_k: int = 3,
+    kb_ids: Sequence[UUID] | None = None,
+    has_image: bool | None = None,
+):
+    # plainto_tsquery ANDs every term; OR-ing them lets ts_rank_cd order partial
+    # matches. Lexemes are already stemmed, so the 'simple' config re-parses as-is.
+    params = {"query_text": query_text, "top_k": top_k}
+    filters = ["chunk_tsv @@ q.query"] + _chunk_filters(params, kb_ids, has_image)
+
+    sql = sql_text(
+        f"""
+        SELECT id, kb_id, chunk_text, image_url,
+           -ts_rank_cd(chunk_tsv, q.query) AS score
+        FROM knowledge_chunk,
+             to_tsquery(
+                 'simple',
+                 replace(plainto_tsquery('english', :query_text)::text, '&', '|')
+             ) AS q(query)
+        {_where(filters)}
+        ORDER BY score ASC
+        LIMIT :top_k
+        """
+    )
+
+    result = await session.execute(sql, params)
+    return result.fetchall()
+
+
+async def hybrid_search(
+    session: AsyncSession,
+    query_text: str,
+    top_k: int = 3,
+    kb_ids: Sequence[UUID] | None = None,
+    score_threshold: float | None = None,
+    ef_search: int | None = None,
+    has_image: bool | None = None,
+) -> List[SearchHit]:
+    """
+    Full-text and vector candidates fetched concurrently, merged with RRF.
+
+    The vector leg is skipped while the embedding model is still loading or
+    its queue is full, so the endpoint degrades to lexical hits instead of
+    waiting. Scores are negated RRF values (lower is better, like `<#>`).
+    """
+    candidates = max(HYBRID_CANDIDATES, top_k * 4)
+
+    async def vector_leg():
+        if not embedding_model.is_ready:
+            return []
+        try:
+            q_vector = await embedding_model.embed_text(query_text)
+        except InferenceQueueFull:
+            return []
+        return await search_chunks(
+            session,
+            q_vector,
+            top_k=candidates,
+            kb_ids=kb_ids,
+            score_threshold=score_threshold,
+            ef_search=ef_search,
+            has_image=has_image,
+        )
+
+    async def lexical_leg():
+        # A session runs one statement at a time, so this leg gets its own
+        async with async_session() as lexical_session:
+            return await lexical_search(
+                lexical_session, query_text, candidates, kb_ids, has_image
+            )
+
+    vector_rows, lexical_rows = await asyncio.gather(vector_leg(), lexical_leg())
+
+    fused = reciprocal_rank_fusion([vector_rows, lexical_rows], k=RRF_K)
+    return [
+        SearchHit(row.id, row.kb_id, row.chunk_text, row.image_url, -score)
+        for row, score in fused[:top_k]
+    ]
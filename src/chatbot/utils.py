@@ -1,7 +1,21 @@
+import asyncio
+import hashlib
+import os
 import re
-from typing import List
+from collections import deque
+from concurrent.futures import Executor
+from typing import AsyncIterator, Dict, List, NamedTuple, Sequence, Tuple
 import PyPDF2
 
+from .executor import inference_executor
+
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "8"))
+PDF_PREFETCH_TASKS = int(os.getenv("PDF_PREFETCH_TASKS", "4"))
+
+_SENTENCE_END = re.compile(r'[.!?]$')
+# Text with no sentence punctuation is released once the carried fragment gets this long
+MAX_CARRY_CHARS = 5000
+
 
 def clean_text(text: str) -> str:
     text = re.sub(r'\s+', ' ', text)
@@ -22,36 +36,231 @@ def extract_text_from_pdf_fileobj(fileobj) -> str:
     return clean_text(" ".join(all_text))
 
 
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
 def split_into_sentences(text: str) -> List[str]:
     sentence_endings = re.compile(r'(?<=[.!?])\s+')
     sentences = sentence_endings.split(text)
     return [s.strip() for s in sentences if s.strip()]
 
 
-def chunk_sentences_with_overlap(sentences: List[str], max_words: int = 200, overlap_words: int = 40) -> List[str]:
-    chunks = []
-    current = []
-    current_len = 0
+class TokenChunk(NamedTuple):
+    text: str
+    # Model input ids for `text`, special tokens included
+    input_ids: List[int]
+
+
+def _special_tokens(tokenizer) -> Tuple[List[int], List[int]]:
+    """Ids the tokenizer adds before and after a single sequence (e.g. <bos> / <eos>)."""
+    plain = tokenizer("a", add_special_tokens=False)["input_ids"]
+    full = tokenizer("a")["input_ids"]
+    for start in range(len(full) - len(plain) + 1):
+        if full[start:start + len(plain)] == plain:
+            return full[:start], full[start + len(plain):]
+    return [], []
+
+
+class TokenChunker:
+    """
+    Packs sentences into chunks of at most `max_tokens` model tokens.
+
+    Sentences are tokenized once, with character offsets, and kept whole
+    where they fit. A chunk is closed before the sentence that would overflow
+    it, and the next chunk starts with its last `overlap_tokens` tokens. A
+    sentence longer than the budget is split at token boundaries. Every
+    token is copied a bounded number of times, so the cost is linear.
+    """
+
+    def __init__(self, tokenizer, max_tokens: int = 256, overlap_tokens: int = 48):
+        self.tokenizer = tokenizer
+        self.prefix, self.suffix = _special_tokens(tokenizer)
+        # Leave room for the special tokens wrapped around every sequence
+        self.budget = max(max_tokens - len(self.prefix) - len(self.suffix), 1)
+        self.overlap = min(max(overlap_tokens, 0), self.budget - 1)
+        self.text = ""
+        self.ids: List[int] = []
+        self.spans: List[Tuple[int, int]] = []
+        # Index of the first token still pending; tokens before it are dropped
+        self.start = 0
+        # Tokens added since the last chunk was emitted (i.e. not overlap)
+        self.fresh = 0
+
+    def encode(self, sentences: List[str]) -> List[Tuple[List[int], List[Tuple[int, int]]]]:
+        # A leading space makes each sentence tokenize as it does mid-chunk
+        encoded = self.tokenizer(
+            [f" {s}" for s in sentences],
+            add_special_tokens=False,
+            return_offsets_mapping=True,
+        )
+        return list(zip(encoded["input_ids"], encoded["offset_mapping"]))
+
+    def _pending(self) -> int:
+        return len(self.ids) - self.start
+
+    def _reset(self):
+        self.text, self.ids, self.spans = "", [], []
+        self.start = 0
+
+    def _drop(self, n: int):
+        if n <= 0:
+            return
+        self.start += n
+        if self.start >= len(self.ids):
+            self._reset()
+        elif self.start * 2 >= len(self.ids):
+            # Compact only once half the buffer is dropped, so a long sentence
+            # split into many chunks is copied a geometric (linear) number of times
+            cut = self.spans[self.start][0]
+            self.text = self.text[cut:]
+            self.ids = self.ids[self.start:]
+            self.spans = [(begin - cut, end - cut) for begin, end in self.spans[self.start:]]
+            self.start = 0
+
+    def _emit(self, n: int) -> TokenChunk:
+        first, last = self.start, self.start + n - 1
+        chunk = TokenChunk(
+            self.text[self.spans[first][0]:self.spans[last][1]].strip(),
+            self.prefix + self.ids[first:last + 1] + self.suffix,
+        )
+        self.fresh = self._pending() - n
+        self._drop(max(n - self.overlap, 0))
+        return chunk
+
+    def add(self, sentence: str, ids: List[int], offsets: List[Tuple[int, int]]) -> List[TokenChunk]:
+        """Add one sentence encoded by `encode`; returns the chunks it completed."""
+        chunks = []
+        if self._pending() + len(ids) > self.budget:
+            if self.fresh:
+                chunks.append(self._emit(self._pending()))
+            if len(ids) <= self.budget:
+                # Carried overlap gives way to a sentence that fits on its own
+                self._drop(self._pending() + len(ids) - self.budget)
+
+        base = len(self.text)
+        self.text += f" {sentence}"
+        self.ids.extend(ids)
+        self.spans.extend((base + begin, base + end) for begin, end in offsets)
+        self.fresh += len(ids)
+
+        while self._pending() > self.budget:
+            chunks.append(self._emit(self.budget))
+        return chunks
+
+    def finish(self) -> TokenChunk | None:
+        chunk = self._emit(self._pending()) if self.fresh else None
+        self._reset()
+        self.fresh = 0
+        return chunk
+
+
+def split_with_carry(carry: str, page_text: str) -> Tuple[List[str], str]:
+    """
+    Split one page into sentences, holding back a trailing fragment that may
+    continue on the next page. Returns (complete sentences, new carry).
+    """
+    text = clean_text(f"{carry} {page_text}")
+    sentences = split_into_sentences(text)
+
+    if (
+        sentences
+        and not _SENTENCE_END.search(sentences[-1])
+        and len(sentences[-1]) < MAX_CARRY_CHARS
+    ):
+        return sentences[:-1], sentences[-1]
+    return sentences, ""
+
+
+def _count_pdf_pages(path: str) -> int:
+    return len(PyPDF2.PdfReader(path).pages)
+
+
+def _extract_page_range(path: str, start: int, end: int) -> List[str]:
+    # Runs in a worker process: each task re-opens the file instead of pickling a reader
+    reader = PyPDF2.PdfReader(path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+
+async def iter_pdf_pages(
+    path: str,
+    pool: Executor,
+    pages_per_task: int = PDF_PAGES_PER_TASK,
+    prefetch: int = PDF_PREFETCH_TASKS,
+) -> AsyncIterator[str]:
+    """
+    Yield page texts in order while later page ranges are extracted in `pool`.
+
+    At most `prefetch` ranges are in flight, which bounds memory regardless
+    of document size.
+    """
+    loop = asyncio.get_running_loop()
+    page_count = await loop.run_in_executor(pool, _count_pdf_pages, path)
+
+    ranges = iter(
+        (start, min(start + pages_per_task, page_count))
+        for start in range(0, page_count, pages_per_task)
+    )
+    in_flight = deque()
+
+    def submit_next():
+        page_range = next(ranges, None)
+        if page_range is not None:
+            in_flight.append(
+                loop.run_in_executor(pool, _extract_page_range, path, *page_range)
+            )
+
+    for _ in range(max(prefetch, 1)):
+        submit_next()
+
+    while in_flight:
+        pages = await in_flight.popleft()
+        submit_next()
+        for page_text in pages:
+            yield page_text
+
+
+async def iter_pdf_sentences(path: str, pool: Executor) -> AsyncIterator[List[str]]:
+    """Stream a PDF as lists of cleaned sentences, one list per page."""
+    carry = ""
+    async for page_text in iter_pdf_pages(path, pool):
+        sentences, carry = split_with_carry(carry, page_text)
+        if sentences:
+            yield sentences
+
+    if carry:
+        yield [carry]
+
 
-    for sentence in sentences:
-        words = sentence.split()
-        wc = len(words)
+async def iter_pdf_chunks(
+    path: str, pool: Executor, chunker: TokenChunker
+) -> AsyncIterator[TokenChunk]:
+    """Stream a PDF as token-budgeted chunks; each page's sentences are tokenized in one call."""
+    async for sentences in iter_pdf_sentences(path, pool):
+        encoded = await inference_executor.run(chunker.encode, sentences)
+        for sentence, (ids, offsets) in zip(sentences, encoded):
+            for chunk in chunker.add(sentence, ids, offsets):
+                yield chunk
 
-        if current_len + wc > max_words and current:
-            chunks.append(" ".join(current))
+    last = chunker.finish()
+    if last:
+        yield last
 
-            if overlap_words > 0:
-                last_words = " ".join(" ".join(current).split()[-overlap_words:])
-                current = [last_words] if last_words else []
-                current_len = len(last_words.split())
-            else:
-                current = []
-                current_len = 0
 
-        current.append(sentence)
-        current_len += wc
+def reciprocal_rank_fusion(rankings: Sequence[Sequence], k: int = 60) -> List[tuple]:
+    """
+    Merge ranked result lists with reciprocal rank fusion.
 
-    if current:
-        chunks.append(" ".join(current))
+    Each ranking is a list of rows with an `id`; a row scores
+    sum(1 / (k + rank)) over the lists it appears in. Returns
+    (row, fused_score) pairs, best first.
+    """
+    scores: Dict = {}
+    rows: Dict = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking, start=1):
+            scores[row.id] = scores.get(row.id, 0.0) + 1.0 / (k + rank)
+            rows.setdefault(row.id, row)
 
-    return chunks
+    ordered = sorted(scores, key=scores.get, reverse=True)
+    return [(rows[i], scores[i]) for i in ordered]
@@ -42,6 +42,24 @@ class Settings(BaseSettings):
     SICK_LEAVE_LIMIT: int = 10
     CASUAL_LEAVE_LIMIT: int = 10
 
+    # bcrypt cost; stored hashes with a different cost are rehashed on login
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_PENDING: int = 32
+    # Verified access-token claims kept in memory until each token's exp
+    JWT_DECODE_CACHE_SIZE: int = 4096
+    # How long a user's membership version is trusted before re-reading it;
+    # tokens issued before an org change stop working within this window
+    MEMBERSHIP_VERSION_CACHE_TTL: int = 30
+    MEMBERSHIP_VERSION_CACHE_SIZE: int = 4096
+    # Login token buckets: burst size and sustained attempts per minute
+    LOGIN_RATE_EMAIL_BURST: int = 5
+    LOGIN_RATE_EMAIL_PER_MINUTE: float = 5
+    LOGIN_RATE_IP_BURST: int = 20
+    LOGIN_RATE_IP_PER_MINUTE: float = 30
+    # Max buckets kept per scope (IP and email each get their own LRU)
+    LOGIN_THROTTLE_MAX_KEYS: int = 10000
+
     AUTH_BASE: str = "https://accounts.google.com/o/oauth2/v2/auth"
     TOKEN_URL: str = "https://oauth2.googleapis.com/token"
     GMAIL_SEND_SCOPE: str = "https://www.googleapis.com/auth/gmail.send"
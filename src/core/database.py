@@ -1,4 +1,6 @@
 from typing import AsyncGenerator
+from pgvector.asyncpg import register_vector
+from sqlalchemy import event
 from sqlmodel import SQLModel
 from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlmodel.ext.asyncio.session import AsyncSession
@@ -15,6 +17,13 @@ async_engine = create_async_engine(
     connect_args={"ssl": True},
 )
 
+
+@event.listens_for(async_engine.sync_engine, "connect")
+def _register_vector_codec(dbapi_connection, connection_record):
+    # Binary pgvector codec: vectors travel as packed float32, not text
+    dbapi_connection.run_async(register_vector)
+
+
 async_session = async_sessionmaker(
     async_engine,
     class_=AsyncSession,
@@ -49,6 +49,10 @@ class Users(SQLModel, table=True):
     profile_picture: Optional[str] = None
     join_date: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.now)
+    # Bumped by a trigger whenever the user's team/role mapping changes
+    membership_version: int = Field(
+        default=0, sa_column_kwargs={"server_default": "0"}
+    )
     asset: List["Assets"] = Relationship(back_populates="user")
     water_logs: List["WaterLogs"] = Relationship(back_populates="user")
     journal_entries: List["JournalEntry"] = Relationship(back_populates="user")
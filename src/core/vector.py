@@ -0,0 +1,50 @@
+from pgvector import HalfVector, Vector
+from pgvector.sqlalchemy import HALFVEC, VECTOR
+
+
+class _BinaryBindMixin:
+    """
+    Hands values to asyncpg untouched instead of rendering them as text.
+
+    pgvector's SQLAlchemy types always render values as "[1.0,2.0,...]"
+    text. With pgvector's binary codecs registered on asyncpg connections (see
+    src/core/database.py) the driver encodes NumPy arrays itself, so the
+    float -> str -> float round trip is skipped. Other drivers (Alembic's
+    psycopg2 engine) keep the text behaviour.
+    """
+
+    value_class = None
+
+    def bind_processor(self, dialect):
+        if dialect.driver != "asyncpg":
+            return super().bind_processor(dialect)
+
+        dim = self.dim
+        value_class = self.value_class
+
+        def process(value):
+            if value is None:
+                return None
+            if not isinstance(value, value_class):
+                value = value_class(value)
+            if dim is not None and value.dimensions() != dim:
+                raise ValueError(
+                    "expected %d dimensions, not %d" % (dim, value.dimensions())
+                )
+            return value
+
+        return process
+
+
+class BinaryVector(_BinaryBindMixin, VECTOR):
+    """pgvector `vector` (float32) column bound through the binary codec."""
+
+    value_class = Vector
+    cache_ok = True
+
+
+class BinaryHalfVector(_BinaryBindMixin, HALFVEC):
+    """pgvector `halfvec` (float16) column bound through the binary codec."""
+
+    value_class = HalfVector
+    cache_ok = True
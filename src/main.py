@@ -1,9 +1,14 @@
 from src.wellbeing.router import router as wellbeing
+import asyncio
 from fastapi import FastAPI
 
 import os
+from src.auth.hashing import password_hasher
 from src.auth.router import router as auth_router
 from src.chatbot.router import router as chatbot_router
+from src.chatbot.embedding import embedding_model
+from src.chatbot.executor import inference_executor, shutdown_extraction_pool
+from src.chatbot.jobs import ingestion_runner
 from src.core.database import init_db
 from src.home.router import router as home_router
 from src.notifications.router import router as notifications_router
@@ -11,15 +16,32 @@ from src.payslip.router import router as payslip_router
 from src.profile.router import router as profile
 from src.journaling.router import router as journal
 from src.core.router import router as app_config
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 
 
 app = FastAPI(title="Yuvabe App API")
 
+EMBEDDING_PRELOAD = os.getenv("EMBEDDING_PRELOAD", "true").lower() == "true"
+
 
 @app.on_event("startup")
 async def on_startup():
     await init_db()
+    await ingestion_runner.recover()
+    if EMBEDDING_PRELOAD:
+        app.state.model_warmup = asyncio.create_task(embedding_model.warm_up())
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await ingestion_runner.shutdown()
+    # Pool shutdowns wait for running work; keep that off the event loop
+    await asyncio.gather(
+        asyncio.to_thread(inference_executor.shutdown),
+        asyncio.to_thread(password_hasher.shutdown),
+        asyncio.to_thread(shutdown_extraction_pool),
+    )
 
 
 app.include_router(home_router, prefix="/home", tags=["Home"])
@@ -44,3 +66,14 @@ app.include_router(journal)
 @app.get("/")
 def root():
     return {"message": "API is running fine!! Finally..."}
+
+
+@app.get("/ready")
+def ready():
+    """Readiness probe: stays 503 until the embedding model is loaded."""
+    if not embedding_model.is_ready:
+        return JSONResponse(
+            status_code=503,
+            content={"ready": False, "error": embedding_model.load_error},
+        )
+    return {"ready": True}
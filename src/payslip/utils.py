@@ -1,4 +1,5 @@
 # src/payslip/utils.py
+import uuid
 from datetime import date, datetime
 from typing import Optional
 
@@ -11,6 +12,8 @@ from sqlalchemy import select
 
 from src.core.database import get_async_session
 from src.core.models import Users
+from src.auth.dependencies import load_identity
+from src.auth.utils import get_current_user
 from src.core.config import settings
 
 
@@ -103,25 +106,11 @@ def calculate_period(mode: str, start_month: str = None, end_month: str = None):
 
 
 async def get_current_user_model(
-    credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
+    user_id: str = Depends(get_current_user),
     session: AsyncSession = Depends(get_async_session),
-):
-    token = credentials.credentials
-
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id = payload.get("sub")
-
-        if not user_id:
-            raise HTTPException(401, "Invalid token")
-
-        result = await session.execute(select(Users).where(Users.id == user_id))
-        user = result.scalar_one_or_none()
-
-        if not user:
-            raise HTTPException(401, "User not found")
-
-        return user
-
-    except JWTError:
-        raise HTTPException(401, "Invalid or expired token")
+) -> Users:
+    identity = await load_identity(session, Users.id == uuid.UUID(user_id))
+    if identity is None:
+        # 401, not 404: clients re-authenticate when the token's user is gone
+        raise HTTPException(401, "User not found")
+    return identity.user
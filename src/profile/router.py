@@ -5,6 +5,13 @@ from src.profile.schemas import AssetResponse
 from src.profile.schemas import LeaveDetailResponse
 from src.core.database import get_async_session
 from src.auth.utils import get_current_user
+from src.auth.dependencies import (
+    LEAD_ROLE,
+    IdentityContext,
+    TokenIdentity,
+    get_identity,
+    get_token_identity,
+)
 from src.notifications.service import get_user_device_tokens
 from src.notifications.fcm import send_fcm
 from src.profile.models import Leave, LeaveType, LeaveStatus
@@ -20,6 +27,7 @@ from sqlmodel.ext.asyncio.session import AsyncSession
 from src.auth.utils import get_current_user  # adjust path
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, or_
 from sqlmodel import select
 import uuid
 from src.core.models import Users
@@ -36,6 +44,8 @@ from src.profile.service import create_leave, mentor_decide_leave
 
 router = APIRouter(prefix="/profile", tags=["Profile"])
 
+HR_TEAM = "HR Team"
+
 
 @router.post("/request", response_model=LeaveResponse)
 async def request_leave_route(
@@ -307,30 +317,15 @@ async def get_leave_details(
 @router.get("/mentor/pending")
 async def mentor_pending_leaves(
     session: AsyncSession = Depends(get_async_session),
-    mentor_id: str = Depends(get_current_user),
+    mentor: TokenIdentity = Depends(get_token_identity),
 ):
-    mentor_uuid = uuid.UUID(mentor_id)
-
-    
-
-    mentor_team = (
-        await session.exec(
-            select(UserTeamsRole).where(UserTeamsRole.user_id == mentor_uuid)
-        )
-    ).first()
-
-    if not mentor_team:
+    if not mentor.team_id:
         raise HTTPException(404, "Mentor has no team")
 
-    team_users = (
-        await session.exec(
-            select(UserTeamsRole.user_id).where(
-                UserTeamsRole.team_id == mentor_team.team_id
-            )
-        )
-    ).all()
-
-    team_user_ids = [u for u in team_users]
+    # Team comes from the token; members are resolved inside the leave query
+    team_user_ids = select(UserTeamsRole.user_id).where(
+        UserTeamsRole.team_id == mentor.team_id
+    )
 
     stmt = (
         select(Leave, Users.user_name)
@@ -443,120 +438,62 @@ async def team_leave_history(
 
 @router.get("/contacts", response_model=BaseResponse)
 async def get_leave_contacts(
-    current_user=Depends(get_current_user),
+    identity: TokenIdentity = Depends(get_token_identity),
     session: AsyncSession = Depends(get_async_session),
 ):
-    # get_current_user returns a STRING user_id
-    user_id = current_user
-
-    if not user_id:
-        raise HTTPException(status_code=400, detail="Invalid user token")
-
-    # 1) Get user's team
-    stmt = select(UserTeamsRole).where(UserTeamsRole.user_id == user_id)
-    ut = (await session.exec(stmt)).first()
-
-    if not ut:
+    if not identity.team_id:
         raise HTTPException(status_code=404, detail="User-Team mapping not found")
 
-    # 2) Get Team Lead role
-    lead_role = (
-        await session.exec(select(Roles).where(Roles.name == "Team Lead"))
-    ).first()
-
-    if not lead_role:
-        raise HTTPException(status_code=500, detail="Team Lead role not found")
-
-    # 3) Find Team Lead user in same team
-    lead_user = (
+    # Team leads of the user's team (taken from the token) and HR, in one query
+    rows = (
         await session.exec(
-            select(Users)
-            .join(UserTeamsRole)
-            .where(UserTeamsRole.team_id == ut.team_id)
-            .where(UserTeamsRole.role_id == lead_role.id)
+            select(Users.email_id, UserTeamsRole.team_id, Teams.name, Roles.name)
+            .join(UserTeamsRole, UserTeamsRole.user_id == Users.id)
+            .join(Teams, Teams.id == UserTeamsRole.team_id)
+            .join(Roles, Roles.id == UserTeamsRole.role_id)
+            .where(
+                or_(
+                    and_(
+                        UserTeamsRole.team_id == identity.team_id,
+                        Roles.name == LEAD_ROLE,
+                    ),
+                    Teams.name == HR_TEAM,
+                )
+            )
         )
     ).all()
 
-    if not lead_user:
-        raise HTTPException(status_code=404, detail="Team lead not found")
-
-    to_email = ", ".join([u.email_id for u in lead_user])
+    lead_emails = [
+        email
+        for email, team_id, _, role_name in rows
+        if team_id == identity.team_id and role_name == LEAD_ROLE
+    ]
 
-    # 4) HR CC emails
-    hr_team = (await session.exec(select(Teams).where(Teams.name == "HR Team"))).first()
+    if not lead_emails:
+        raise HTTPException(status_code=404, detail="Team lead not found")
 
-    cc = []
-    if hr_team:
-        hr_users = (
-            await session.exec(
-                select(Users)
-                .join(UserTeamsRole)
-                .where(UserTeamsRole.team_id == hr_team.id)
-            )
-        ).all()
+    to_email = ", ".join(lead_emails)
 
-        cc = [str(row.email_id) for row in hr_users]
+    # HR CC emails
+    cc = [str(email) for email, _, team_name, _ in rows if team_name == HR_TEAM]
 
     return BaseResponse(code=200, message="success", data={"to": to_email, "cc": cc})
 
 
 @router.get("/details", response_model=BaseResponse)
-async def get_profile_details(
-    current_user=Depends(get_current_user),
-    session: AsyncSession = Depends(get_async_session),
-):
-    user_id = current_user
-
-    # 1) Get the user
-    user = await session.get(Users, user_id)
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    # 2) Get user's team mapping
-    user_team = (
-        await session.exec(
-            select(UserTeamsRole).where(UserTeamsRole.user_id == user_id)
-        )
-    ).first()
+async def get_profile_details(identity: IdentityContext = Depends(get_identity)):
+    user = identity.user
 
-    if not user_team:
+    if not identity.team:
         raise HTTPException(status_code=404, detail="User does not belong to any team")
 
-    # 3) Get team name
-    team = await session.get(Teams, user_team.team_id)
+    team = identity.team
 
-    # 4) Find mentor (team lead)
-    lead_role = (
-        await session.exec(select(Roles).where(Roles.name == "Mentor"))
-    ).first()
+    mentor_names = [u.user_name for u in identity.mentors]
+    mentor_emails = [u.email_id for u in identity.mentors]
 
-    mentor_users = (
-        await session.exec(
-            select(Users)
-            .join(UserTeamsRole)
-            .where(UserTeamsRole.team_id == user_team.team_id)
-            .where(UserTeamsRole.role_id == lead_role.id)
-        )
-    ).all()
-
-    mentor_names = [u.user_name for u in mentor_users]
-    mentor_emails = [u.email_id for u in mentor_users]
-
-    sub_mentor_role = (
-        await session.exec(select(Roles).where(Roles.name == "Sub Mentor"))
-    ).first()
-
-    sub_mentor_users = (
-        await session.exec(
-            select(Users)
-            .join(UserTeamsRole)
-            .where(UserTeamsRole.team_id == user_team.team_id)
-            .where(UserTeamsRole.role_id == sub_mentor_role.id)
-        )
-    ).all()
-
-    sub_mentor_names = [u.user_name for u in sub_mentor_users]
-    sub_mentor_emails = [u.email_id for u in sub_mentor_users]
+    sub_mentor_names = [u.user_name for u in identity.sub_mentors]
+    sub_mentor_emails = [u.email_id for u in identity.sub_mentors]
 
     final_lead_name = (
         ", ".join(mentor_names) if mentor_names else ", ".join(sub_mentor_names)
@@ -722,17 +659,23 @@ async def update_profile(
     # --- Handle password update ---
     if body.current_password and body.new_password:
         # Check current password matches
-        from src.auth.utils import verify_password, hash_password
+        from src.auth.exceptions import PasswordHashQueueFull
+        from src.auth.hashing import password_hasher
 
-        if not verify_password(body.current_password, user.password):
+        try:
+            if not await password_hasher.verify(body.current_password, user.password):
+                raise HTTPException(
+                    status_code=400,
+                    detail="Current password is incorrect",
+                )
+
+            # update password
+            user.password = await password_hasher.hash(body.new_password)
+        except PasswordHashQueueFull as e:
             raise HTTPException(
-                status_code=400,
-                detail="Current password is incorrect",
+                status_code=429, detail=str(e), headers={"Retry-After": "1"}
             )
 
-        # update password
-        user.password = hash_password(body.new_password)
-
     elif body.new_password and not body.current_password:
         raise HTTPException(
             status_code=400,
@@ -1,5 +1,6 @@
 from src.notifications.service import get_user_device_tokens
 from src.profile.utils import build_raw_message, refresh_access_token
+from src.auth.dependencies import load_identity
 from src.core.models import Assets, Users, UserTeamsRole, Roles
 from fastapi import HTTPException
 from passlib.context import CryptContext
@@ -33,64 +34,18 @@ async def _get_team_roles(session: AsyncSession, user_id: uuid.UUID):
     """
     Find user's team, mentor and team lead in that team.
     """
-    # 1) Get user's team mapping
-    user_team = (
-        await session.exec(
-            select(UserTeamsRole).where(UserTeamsRole.user_id == user_id)
-        )
-    ).first()
-
-    if not user_team:
+    identity = await load_identity(session, Users.id == user_id)
+
+    if not identity or not identity.team:
         raise ValueError("User has no team mapping")
 
-    # 2) Get Mentor role
-    mentor_role = (
-        await session.exec(select(Roles).where(Roles.name == "Mentor"))
-    ).first()
-    sub_mentor_role = (
-        await session.exec(select(Roles).where(Roles.name == "Sub Mentor"))
-    ).first()
-
-    if not mentor_role and not sub_mentor_role:
-        raise ValueError("No Mentor / Sub Mentor roles defined in system")
-
-    mentor_role_ids = []
-    if mentor_role:
-        mentor_role_ids.append(mentor_role.id)
-    if sub_mentor_role:
-        mentor_role_ids.append(sub_mentor_role.id)
-
-    # 3) Get Team Lead role
-    lead_role = (
-        await session.exec(select(Roles).where(Roles.name == "Team Lead"))
-    ).first()
-
-    # 4) Find mentor in same team
-    mentor_users = (
-        await session.exec(
-            select(Users)
-            .join(UserTeamsRole, UserTeamsRole.user_id == Users.id)
-            .where(UserTeamsRole.team_id == user_team.team_id)
-            .where(UserTeamsRole.role_id.in_(mentor_role_ids))
-        )
-    ).all()
+    # Mentors first so the main mentor is a Mentor when the team has one
+    mentor_users = identity.mentors + identity.sub_mentors
 
     if not mentor_users:
         raise ValueError("No Mentor or Sub Mentor found in user's team")
 
-    # 5) Find team lead in same team
-    lead_users = []
-    if lead_role:
-        lead_users = (
-            await session.exec(
-                select(Users)
-                .join(UserTeamsRole, UserTeamsRole.user_id == Users.id)
-                .where(UserTeamsRole.team_id == user_team.team_id)
-                .where(UserTeamsRole.role_id == lead_role.id)
-            )
-        ).all()
-
-    return mentor_users, lead_users
+    return mentor_users, identity.leads
 
 
 async def _get_tokens_for_users(
@@ -111,12 +66,12 @@ async def _get_tokens_for_users(
 
 
 async def create_leave(session, user_id, body):
-    # Get the user
-    user = await session.get(Users, user_id)
-
     # Get mentor + team lead
     mentor_users, lead_users = await _get_team_roles(session, user_id)
 
+    # Already in the session's identity map from the lookup above
+    user = await session.get(Users, user_id)
+
     main_mentor = mentor_users[0]  # could be Mentor OR Sub Mentor
     main_lead = lead_users[0] if lead_users else None
 